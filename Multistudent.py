@@ -3,7 +3,8 @@ import face_recognition
 import os
 import csv
 from datetime import datetime
-import numpy as np
+from encoding_cache import load_known_encodings
+from gallery import FaceGallery
 
 # --- 1. SETUP ---
 
@@ -11,21 +12,18 @@ import numpy as np
 images_path = "images"
 
 # Lists to store known face encodings and names
-known_face_encodings = []
-known_face_names = []
+gallery = FaceGallery()
 
 # Load student images and learn how to recognize them
 print("Loading known faces...")
-for filename in os.listdir(images_path):
-    if filename.endswith((".jpg", ".png", ".jpeg")):
-        image_path = os.path.join(images_path, filename)
-        student_image = face_recognition.load_image_file(image_path)
-        try:
-            student_face_encoding = face_recognition.face_encodings(student_image)[0]
-            known_face_encodings.append(student_face_encoding)
-            known_face_names.append(os.path.splitext(filename)[0])
-        except IndexError:
-            print(f"Warning: No face found in {filename}. Skipping this file.")
+for filename, student_face_encoding in load_known_encodings(images_path):
+    if student_face_encoding is None:
+        print(f"Warning: No face found in {filename}. Skipping this file.")
+        continue
+    gallery.add(os.path.splitext(filename)[0], student_face_encoding)
+if len(gallery) == 0:
+    print(f"FATAL: No known faces were loaded. Check the '{images_path}' folder. Exiting.")
+    exit()
 print("Known faces loaded successfully.")
 
 # Get a reference to the webcam
@@ -73,15 +71,13 @@ with open(attendance_file, 'a', newline='') as f:
 
             # Reset the list of names for this new processing cycle
             face_names = []
-            for face_encoding in current_face_encodings:
-                matches = face_recognition.compare_faces(known_face_encodings, face_encoding)
+            # One batched distance computation covers every face in the frame;
+            # 0.6 is the compare_faces() default tolerance this script used.
+            best_rows, best_distances = gallery.match(current_face_encodings)
+            for best_match_index, best_match_distance in zip(best_rows[:, 0], best_distances[:, 0]):
                 name = "Unknown"
-
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index]:
-                        name = known_face_names[best_match_index]
+                if best_match_distance <= 0.6:
+                    name = gallery.name_of(best_match_index)
 
                 face_names.append(name)
 
@@ -4,7 +4,9 @@ import os
 import csv
 from datetime import datetime
 import numpy as np
-from collections import defaultdict, deque
+from collections import defaultdict
+from encoding_cache import load_known_encodings
+from tracker import IoUTracker
 
 # ===================================================================
 #                          CONFIGURATION
@@ -25,17 +27,12 @@ known_face_names = []
 
 print("Loading known faces...")
 # ... (Image loading logic is unchanged, but ensure your dataset is clean!) ...
-for filename in os.listdir(IMAGES_PATH):
-    if filename.endswith((".jpg", ".png", ".jpeg")):
-        image_path = os.path.join(IMAGES_PATH, filename)
-        name = filename.split('_')[0]
-        student_image = face_recognition.load_image_file(image_path)
-        try:
-            student_face_encoding = face_recognition.face_encodings(student_image)[0]
-            known_face_encodings.append(student_face_encoding)
-            known_face_names.append(name)
-        except IndexError:
-            print(f"Warning: No face found in {filename}. Please replace this image.")
+for filename, student_face_encoding in load_known_encodings(IMAGES_PATH):
+    if student_face_encoding is None:
+        print(f"Warning: No face found in {filename}. Please replace this image.")
+        continue
+    known_face_encodings.append(student_face_encoding)
+    known_face_names.append(filename.split('_')[0])
 if not known_face_encodings:
     print("FATAL: No known faces were loaded. Check the 'images' folder. Exiting.")
     exit()
@@ -50,9 +47,9 @@ present_students = []
 process_this_frame = True
 
 # --- ADVANCED: Variables for Confidence Buffering ---
-# This dictionary will store a history of recent recognitions for each face track
-# The key will be a simple track ID (0, 1, 2...)
-face_recognition_history = defaultdict(lambda: deque(maxlen=HISTORY_LENGTH))
+# The tracker follows each face across frames (by box overlap) and keeps
+# a history of recent recognitions per track
+face_tracker = IoUTracker(history_length=HISTORY_LENGTH)
 # This list will hold the final, stable names to be displayed
 stable_face_names = []
 
@@ -85,14 +82,15 @@ with open(attendance_file, 'a', newline='') as f:
 
             # --- CONFIDENCE BUFFER LOGIC ---
             stable_face_names = []
-            # We assign a temporary track ID based on the order of detection
-            for i, name in enumerate(current_face_names):
-                face_recognition_history[i].append(name)
+            # Each face is matched to its track, so histories never mix between people
+            for track, name in zip(face_tracker.update(face_locations), current_face_names):
+                history = track.history
+                history.append(name)
                 # Check if the history is full and consistent
-                if len(face_recognition_history[i]) == HISTORY_LENGTH:
+                if len(history) == HISTORY_LENGTH:
                     # Count occurrences of each name in the history
                     name_counts = defaultdict(int)
-                    for past_name in face_recognition_history[i]:
+                    for past_name in history:
                         name_counts[past_name] += 1
                     
                     # Find the most common name
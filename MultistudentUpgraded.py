@@ -4,6 +4,7 @@ import os
 import csv
 from datetime import datetime
 import numpy as np
+from encoding_cache import load_known_encodings
 
 # ===================================================================
 #                          CONFIGURATION
@@ -27,21 +28,16 @@ known_face_names = []
 
 # Load student images and learn how to recognize them
 print("Loading known faces...")
-for filename in os.listdir(IMAGES_PATH):
-    if filename.endswith((".jpg", ".png", ".jpeg")):
-        image_path = os.path.join(IMAGES_PATH, filename)
-        
-        # The name is extracted from the filename (e.g., "Gouri_1.jpg" -> "Gouri")
-        name = filename.split('_')[0]
-        
-        student_image = face_recognition.load_image_file(image_path)
-        
-        try:
-            student_face_encoding = face_recognition.face_encodings(student_image)[0]
-            known_face_encodings.append(student_face_encoding)
-            known_face_names.append(name)
-        except IndexError:
-            print(f"Warning: No face found in {filename}. Skipping this file.")
+# Unchanged images are served from the on-disk encoding cache.
+for filename, student_face_encoding in load_known_encodings(IMAGES_PATH):
+    if student_face_encoding is None:
+        print(f"Warning: No face found in {filename}. Skipping this file.")
+        continue
+
+    # The name is extracted from the filename (e.g., "Gouri_1.jpg" -> "Gouri")
+    name = filename.split('_')[0]
+    known_face_encodings.append(student_face_encoding)
+    known_face_names.append(name)
 
 print(f"Known faces loaded successfully. Found images for {len(set(known_face_names))} unique people.")
 
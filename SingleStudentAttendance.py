@@ -239,6 +239,7 @@ import os
 import csv
 from datetime import datetime
 import numpy as np
+from encoding_cache import load_known_encodings
 
 # --- 1. SETUP ---
 
@@ -251,16 +252,12 @@ known_face_names = []
 
 # Load student images and learn how to recognize them
 print("Loading known faces...")
-for filename in os.listdir(images_path):
-    if filename.endswith((".jpg", ".png", ".jpeg")):
-        image_path = os.path.join(images_path, filename)
-        student_image = face_recognition.load_image_file(image_path)
-        try:
-            student_face_encoding = face_recognition.face_encodings(student_image)[0]
-            known_face_encodings.append(student_face_encoding)
-            known_face_names.append(os.path.splitext(filename)[0])
-        except IndexError:
-            print(f"Warning: No face found in {filename}. Skipping this file.")
+for filename, student_face_encoding in load_known_encodings(images_path):
+    if student_face_encoding is None:
+        print(f"Warning: No face found in {filename}. Skipping this file.")
+        continue
+    known_face_encodings.append(student_face_encoding)
+    known_face_names.append(os.path.splitext(filename)[0])
 print("Known faces loaded successfully.")
 
 # Get a reference to the webcam
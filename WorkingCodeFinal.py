@@ -3,8 +3,10 @@ import face_recognition
 import os
 import csv
 from datetime import datetime
-import numpy as np
-from collections import defaultdict, deque
+from collections import defaultdict
+from encoding_cache import load_known_encodings
+from gallery import FaceGallery
+from tracker import IoUTracker
 
 # ===================================================================
 #                          CONFIGURATION
@@ -18,27 +20,20 @@ HISTORY_LENGTH = 5
 # ===================================================================
 
 # --- SETUP ---
-known_face_encodings = []
-known_face_names = []
+gallery = FaceGallery()
 
 print("Loading known faces...")
 # ... (Image loading logic remains the same) ...
 # IMPORTANT: Follow the Dataset Audit steps to ensure this data is clean!
-for filename in os.listdir(IMAGES_PATH):
-    if filename.endswith((".jpg", ".png", ".jpeg")):
-        image_path = os.path.join(IMAGES_PATH, filename)
-        name = filename.split('_')[0]
-        student_image = face_recognition.load_image_file(image_path)
-        try:
-            student_face_encoding = face_recognition.face_encodings(student_image)[0]
-            known_face_encodings.append(student_face_encoding)
-            known_face_names.append(name)
-        except IndexError:
-            print(f"Warning: No face found in {filename}. Please replace this image.")
-if not known_face_encodings:
+for filename, student_face_encoding in load_known_encodings(IMAGES_PATH):
+    if student_face_encoding is None:
+        print(f"Warning: No face found in {filename}. Please replace this image.")
+        continue
+    gallery.add(filename.split('_')[0], student_face_encoding)
+if len(gallery) == 0:
     print("FATAL: No known faces were loaded. Check the 'images' folder. Exiting.")
     exit()
-print(f"Known faces loaded successfully. Found images for {len(set(known_face_names))} unique people.")
+print(f"Known faces loaded successfully. Found images for {len(gallery.names)} unique people.")
 
 video_capture = cv2.VideoCapture(0)
 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -47,7 +42,7 @@ attendance_file = f"attendance_{current_date}.csv"
 # --- INITIALIZE VARIABLES ---
 present_students = []
 process_this_frame = True
-face_recognition_history = defaultdict(lambda: deque(maxlen=HISTORY_LENGTH))
+face_tracker = IoUTracker(history_length=HISTORY_LENGTH)
 stable_face_names = []
 face_locations = []
 
@@ -68,32 +63,30 @@ with open(attendance_file, 'a', newline='') as f:
             face_locations = face_recognition.face_locations(rgb_small_frame)
             current_face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
 
+            # All faces in the frame are matched against the gallery in one batched GEMM
             current_face_names = []
-            for face_encoding in current_face_encodings:
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
+            best_rows, best_distances = gallery.match(current_face_encodings)
+            for best_match_index, best_match_distance in zip(best_rows[:, 0], best_distances[:, 0]):
                 name = "Unknown"
-                
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    best_match_distance = face_distances[best_match_index]
-
-                    # --- DIAGNOSTIC PRINT ---
-                    # This line is crucial for debugging the data.
-                    best_match_name = known_face_names[best_match_index]
-                    print(f"BEST MATCH: {best_match_name:<10} | DISTANCE: {best_match_distance:.4f}")
-
-                    if best_match_distance < TOLERANCE:
-                        name = best_match_name
-                
+
+                # --- DIAGNOSTIC PRINT ---
+                # This line is crucial for debugging the data.
+                best_match_name = gallery.name_of(best_match_index)
+                print(f"BEST MATCH: {best_match_name:<10} | DISTANCE: {best_match_distance:.4f}")
+
+                if best_match_distance < TOLERANCE:
+                    name = best_match_name
+
                 current_face_names.append(name)
 
             # --- CONFIDENCE BUFFER LOGIC ---
             stable_face_names = []
-            for i, name in enumerate(current_face_names):
-                face_recognition_history[i].append(name)
-                if len(face_recognition_history[i]) == HISTORY_LENGTH:
+            for track, name in zip(face_tracker.update(face_locations), current_face_names):
+                history = track.history
+                history.append(name)
+                if len(history) == HISTORY_LENGTH:
                     name_counts = defaultdict(int)
-                    for past_name in face_recognition_history[i]:
+                    for past_name in history:
                         name_counts[past_name] += 1
                     
                     most_common_name = max(name_counts, key=name_counts.get)
@@ -0,0 +1,168 @@
+import hashlib
+import os
+
+import numpy as np
+
+from gallery import ENCODING_SIZE, squared_distances
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+# IVF = inverted file: the gallery is split into k-means buckets ("lists")
+# and a face is only compared against the encodings in its closest buckets.
+# --- More lists => smaller buckets => faster search, lower recall ---
+DEFAULT_LISTS = None      # None picks ~4*sqrt(gallery size)
+# --- More probes => more buckets searched => higher recall, slower ---
+DEFAULT_PROBES = 8
+KMEANS_ITERATIONS = 20
+INDEX_VERSION = 1
+# ===================================================================
+
+
+def gallery_fingerprint(gallery):
+    """Hash of the gallery contents, used to tell whether a saved index is stale."""
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(gallery.encodings).tobytes())
+    digest.update(np.ascontiguousarray(gallery.labels).tobytes())
+    return digest.hexdigest()
+
+
+def kmeans(points, n_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means in NumPy. Returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+    assignments = np.zeros(len(points), dtype=np.intp)
+    for iteration in range(iterations):
+        centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+        sq = squared_distances(points, centroids, centroid_sq_norms)
+        new_assignments = np.argmin(sq, axis=1)
+        if iteration > 0 and np.array_equal(new_assignments, assignments):
+            break
+        assignments = new_assignments
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty buckets on random points so every list stays useful
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+    return centroids, assignments
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index over a FaceGallery.
+
+    Exposes the same match(face_encodings, top_k) -> (rows, distances) call
+    as FaceGallery, with rows being gallery rows, so it can be dropped in
+    behind the existing "best match + distance < TOLERANCE" decision.
+    """
+
+    def __init__(self, gallery, n_lists=DEFAULT_LISTS, n_probe=DEFAULT_PROBES):
+        self.gallery = gallery
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.fingerprint = None
+        self._gallery_version = None
+        self._centroids = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self._centroid_sq_norms = np.empty(0, dtype=np.float32)
+        self._assignments = np.empty(0, dtype=np.intp)   # List of each gallery row
+        self._rows = np.empty(0, dtype=np.intp)           # Gallery rows, grouped by list
+        self._offsets = np.zeros(1, dtype=np.intp)        # List i is _rows[_offsets[i]:_offsets[i+1]]
+        self._vectors = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+
+    def _n_lists_for(self, n):
+        n_lists = self.n_lists or int(4 * np.sqrt(n))
+        return max(1, min(n_lists, n))
+
+    def build(self):
+        """Clusters the current gallery contents into inverted lists."""
+        points = np.array(self.gallery.encodings, dtype=np.float32)
+        if len(points) == 0:
+            self.fingerprint = gallery_fingerprint(self.gallery)
+            return self
+        n_lists = self._n_lists_for(len(points))
+        centroids, assignments = kmeans(points, n_lists)
+        self._set_lists(centroids, assignments)
+        self.fingerprint = gallery_fingerprint(self.gallery)
+        return self
+
+    def _set_lists(self, centroids, assignments):
+        self._centroids = centroids.astype(np.float32)
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self._centroids, self._centroids)
+        self._assignments = np.asarray(assignments, dtype=np.intp)
+        self._rows = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(centroids))
+        self._offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.intp)
+        self._gallery_version = self.gallery.version
+        # A contiguous copy in list order, so each list is one slice
+        self._vectors = np.ascontiguousarray(self.gallery.encodings[self._rows], dtype=np.float32)
+        self._sq_norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+
+    def is_stale(self):
+        return self._gallery_version != self.gallery.version
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, version=INDEX_VERSION, fingerprint=self.fingerprint,
+                 centroids=self._centroids, assignments=self._assignments)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_or_build(cls, gallery, path, n_lists=DEFAULT_LISTS, n_probe=DEFAULT_PROBES):
+        """Loads the saved index if it matches the gallery, otherwise rebuilds and saves it."""
+        index = cls(gallery, n_lists, n_probe)
+        fingerprint = gallery_fingerprint(gallery)
+        try:
+            with np.load(path) as data:
+                if (int(data["version"]) == INDEX_VERSION and str(data["fingerprint"]) == fingerprint
+                        and len(data["centroids"]) == index._n_lists_for(len(gallery))):
+                    index._set_lists(data["centroids"], data["assignments"])
+                    index.fingerprint = fingerprint
+                    print(f"ANN index loaded from {path} ({len(index._centroids)} lists).")
+                    return index
+        except (OSError, ValueError, KeyError):
+            pass
+        index.build()
+        index.save(path)
+        print(f"ANN index built and saved to {path} ({len(index._centroids)} lists).")
+        return index
+
+    def match(self, face_encodings, top_k=1):
+        """
+        Returns (rows, distances), each shaped (faces, k), nearest first.
+        Only the n_probe closest lists are searched for each face. If the
+        gallery changed since the index was built, falls back to exact search.
+        """
+        if self.is_stale():
+            return self.gallery.match(face_encodings, top_k)
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        faces = len(queries)
+        n_lists = len(self._centroids)
+        k = min(top_k, len(self._rows))
+        rows = np.full((faces, k), -1, dtype=np.intp)
+        distances = np.full((faces, k), np.inf, dtype=np.float32)
+        if faces == 0 or k == 0:
+            return rows, distances
+
+        n_probe = min(self.n_probe, n_lists)
+        centroid_sq = squared_distances(queries, self._centroids, self._centroid_sq_norms)
+        if n_probe < n_lists:
+            probes = np.argpartition(centroid_sq, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(n_lists), (faces, n_lists))
+
+        for i in range(faces):
+            candidates = np.concatenate([np.arange(self._offsets[p], self._offsets[p + 1]) for p in probes[i]])
+            if len(candidates) == 0:
+                continue
+            sq = squared_distances(queries[i:i + 1], self._vectors[candidates], self._sq_norms[candidates])[0]
+            found = min(k, len(candidates))
+            best = np.argpartition(sq, found - 1)[:found] if found < len(candidates) else np.arange(found)
+            best = best[np.argsort(sq[best])]
+            rows[i, :found] = self._rows[candidates[best]]
+            distances[i, :found] = np.sqrt(sq[best])
+        return rows, distances
@@ -1,150 +1,227 @@
-from flask import Flask, render_template, Response
-import cv2
-import face_recognition
-import os
-import csv
-from datetime import datetime
-import numpy as np
-from collections import defaultdict, deque
-import threading
+from flask import Flask, render_template, Response, jsonify, abort
+from attendance import AttendanceLog
+from batch_encoder import BatchedFaceEncoder
+from camera_registry import CameraRegistry
+from camera_scheduler import DetectionScheduler
+from face_detectors import make_detector
+from face_quality import FaceQualityGate
+from gallery import FaceGallery
+from process_workers import RecognitionWorkerPool
+from tiled_detection import TiledDetector
+from motion_gate import MotionGate
+from roi_detection import RegionDetector
+from scale_control import AdaptiveScaleController
+from staged_pipeline import StagedRecognitionPipeline
+from recognition_service import RecognitionPipeline, load_gallery, make_matcher
 
 # ===================================================================
 #                          CONFIGURATION
 # ===================================================================
 IMAGES_PATH = "images"
+# Camera id -> source: an index, a video file (played back in a loop) or a stream
+# URL. A stream can name a "stand_in" video used when the stream cannot be opened;
+# "sessions" (class times) give a camera priority for detection while they run.
+#   "lab": {"source": "recordings/lab.mp4", "sessions": [("09:00", "10:30"), ("14:00", "15:30")]},
+#   "hall": {"source": "rtsp://10.0.0.12/stream1", "stand_in": "recordings/hall.mp4"},
+CAMERAS = {
+    "main": {"source": 0},
+}
+CAPTURE_BUFFER_SIZE = 1   # Frames kept by each capture thread; older ones are dropped
 TOLERANCE = 0.50
 CONFIRMATION_THRESHOLD = 4
 HISTORY_LENGTH = 5
+MAX_MISSED_FRAMES = 5     # Processed frames a face track survives without being detected
+REVERIFY_EVERY_N_FRAMES = 10   # Confirmed faces are re-encoded only this often (or on a jump)
+DETECT_EVERY_N_FRAMES = 3      # Full HOG detection every Nth processed frame; optical flow in between
+PROCESSING_FPS = 15       # Frames recognised per second, with or without viewers
+# --- Staged pipeline: detect / recognise / render overlap on separate threads (multi-core boxes) ---
+STAGED_PIPELINE = False
+DETECT_WORKERS = 2
+RENDER_WORKERS = 2
+STAGE_QUEUE_SIZE = 2
+# --- Detection budget: shared by all cameras, rooms with activity get it first ---
+DETECTION_BUDGET = 1.0    # Seconds of detection + encoding per second (~cores for dlib); None = no limit
+# --- Worker processes: run dlib outside the Flask process (0 = in-process) ---
+RECOGNITION_PROCESSES = 0  # Shared by all cameras; needs FULL_RESOLUTION_ENCODING for encodings
+# --- Motion gate: skip detection when nothing moves, idle down when the room is empty ---
+MOTION_GATE = True
+IDLE_AFTER_SECONDS = 60        # Seconds without motion before dropping to the idle rate
+IDLE_PROCESSING_FPS = 5        # Idle cadence; the first frame with motion restores full rate
+IDLE_CAMERA_FPS = 5
+ACTIVE_CAMERA_FPS = 30
+FACE_DETECTOR = "hog"      # "hog", "haar" (OpenCV cascade, fastest) or "cnn"; see benchmark_detectors.py
+# --- Crowd mode: detect on overlapping full-resolution tiles, in parallel ---
+CROWD_MODE = False        # For wide shots of a whole class; replaces the adaptive detection scale
+CROWD_UPSAMPLE = 0        # 1 finds even smaller back-row faces, at ~4x the cost
+# --- Detection scale: chosen per frame from measured latency and face sizes ---
+DETECTION_LATENCY_BUDGET_MS = 60
+MIN_FACE_PIXELS = 70      # Face height HOG needs at detection resolution (back rows => scale up)
+FULL_RESOLUTION_ENCODING = True   # Encode from sharp full-resolution crops instead of the detection frame
+# --- Batched encoding: faces from all frames and cameras share one ResNet call (in-process only) ---
+BATCH_ENCODING = True
+ENCODING_BATCH_SIZE = 32
+ENCODING_MAX_WAIT_MS = 10  # Longest a lone face waits for company; bounds single-face latency
+# --- Quality gate: faces failing these checks are not encoded ---
+QUALITY_GATE = True
+MIN_FACE_SIZE = 40        # Full-frame pixels
+MIN_SHARPNESS = 60.0      # Laplacian variance; lower = blurrier
+MAX_FACE_YAW = 0.6        # 0 frontal .. 1 profile; None skips the landmark-based check
+# --- ROI detection: between full scans, only search around faces already tracked ---
+FULL_SCAN_EVERY_N = 10    # Detections between full-frame scans (new arrivals are found on these)
+ROI_PADDING = 1.0         # Search window margin, as a multiple of the face box size
+STATIC_ROI = None         # e.g. [(0.2, 0.7, 1.0, 0.3)]: (top, right, bottom, left) fractions always scanned
+VIEWER_QUEUE_SIZE = 2     # Frames buffered per viewer before old ones are dropped
+ENROLLMENT_WORKERS = -1   # Processes used to encode new images (-1 = all cores)
+# "exact" (brute force), "centroid" (exact, two-stage), "ivf" (approximate, 50k+)
+# or "float16"/"int8" (quantized scan with exact re-rank, less memory per worker)
+MATCHER = "exact"
+ANN_INDEX_PATH = "ann_index.npz"
+ANN_PROBES = 8            # IVF buckets searched per face: higher = better recall, slower
+RERANK_PATH = "gallery_rerank.npy"   # float16/int8: full-precision rows, memory-mapped and shared by workers
 # ===================================================================
 
 # --- INITIALIZE FLASK APP ---
 app = Flask(__name__)
 
 # --- GLOBAL VARIABLES (Initialized once at startup) ---
-known_face_encodings = []
-known_face_names = []
-video_capture = cv2.VideoCapture(0)
-present_students = []
-
-# Thread-safe lock for file writing and accessing shared variables
-data_lock = threading.Lock()
+gallery = FaceGallery()   # Contiguous float32 matrix of known encodings + name table
+matcher = gallery         # Anything with match(encodings) -> (rows, distances)
+cameras = CameraRegistry(CAPTURE_BUFFER_SIZE)   # One capture thread + pipeline per camera, opened at startup
+attendance_log = AttendanceLog()   # Thread-safe and shared by every camera; marks each student once
+worker_pool = None                 # RecognitionWorkerPool when RECOGNITION_PROCESSES > 0
+scheduler = None                   # DetectionScheduler when DETECTION_BUDGET is set
+batch_encoder = None               # BatchedFaceEncoder when BATCH_ENCODING is on
 
 # --- SETUP: LOAD FACES (Done only once) ---
 def load_known_faces():
     """Loads face encodings and names from the images folder."""
-    global known_face_encodings, known_face_names
+    global matcher
     print("Loading known faces...")
-    for filename in os.listdir(IMAGES_PATH):
-        if filename.endswith((".jpg", ".png", ".jpeg")):
-            image_path = os.path.join(IMAGES_PATH, filename)
-            name = filename.split('_')[0]
-            try:
-                student_image = face_recognition.load_image_file(image_path)
-                encoding = face_recognition.face_encodings(student_image)[0]
-                known_face_encodings.append(encoding)
-                known_face_names.append(name)
-            except IndexError:
-                print(f"Warning: No face found in {filename}. Please replace this image.")
-    if not known_face_encodings:
+    # Only new or changed images are encoded; the rest come from the on-disk cache.
+    load_gallery(IMAGES_PATH, ENROLLMENT_WORKERS, gallery)
+    if len(gallery) == 0:
         print("FATAL: No known faces loaded. Check the 'images' folder. Exiting.")
         exit()
-    print(f"Known faces loaded successfully for {len(set(known_face_names))} unique people.")
-
-def generate_frames():
-    """Generator function to yield processed video frames."""
-    # Local variables for frame processing
-    process_this_frame = True
-    face_recognition_history = defaultdict(lambda: deque(maxlen=HISTORY_LENGTH))
-
-    while True:
-        success, frame = video_capture.read()
-        if not success:
-            print("Error: Could not read frame from webcam.")
-            break
-
-        # Alternate frame processing for performance
-        if process_this_frame:
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-            face_locations = face_recognition.face_locations(rgb_small_frame)
-            current_face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-            current_face_names = []
-            for face_encoding in current_face_encodings:
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                name = "Unknown"
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if face_distances[best_match_index] < TOLERANCE:
-                        name = known_face_names[best_match_index]
-                current_face_names.append(name)
-
-            # --- CONFIDENCE BUFFER LOGIC ---
-            stable_face_names = []
-            for i, name in enumerate(current_face_names):
-                face_recognition_history[i].append(name)
-                if len(face_recognition_history[i]) == HISTORY_LENGTH:
-                    most_common_name = max(set(face_recognition_history[i]), key=list(face_recognition_history[i]).count)
-                    if list(face_recognition_history[i]).count(most_common_name) >= CONFIRMATION_THRESHOLD:
-                        stable_name = most_common_name
-                        stable_face_names.append(stable_name)
-
-                        # --- Thread-safe Attendance Marking ---
-                        with data_lock:
-                            if stable_name != "Unknown" and stable_name not in present_students:
-                                current_time = datetime.now().strftime("%H:%M:%S")
-                                current_date = datetime.now().strftime("%Y-%m-%d")
-                                attendance_file = f"attendance_{current_date}.csv"
-                                
-                                # Open file within the lock
-                                with open(attendance_file, 'a+', newline='') as f:
-                                    # Move cursor to the start to check if file is empty
-                                    f.seek(0)
-                                    if not f.read(1): # Check if file is empty
-                                        csv.writer(f).writerow(["Name", "Time"])
-                                    csv.writer(f).writerow([stable_name, current_time])
-                                
-                                present_students.append(stable_name)
-                                print(f"STABLE ID: Attendance marked for {stable_name} at {current_time}")
-                    else:
-                        stable_face_names.append("Processing...")
-                else:
-                    stable_face_names.append("Processing...")
-
-        process_this_frame = not process_this_frame
-
-        # --- Draw results on the frame ---
-        for (top, right, bottom, left), name in zip(face_locations, stable_face_names):
-            top *= 4; right *= 4; bottom *= 4; left *= 4
-            box_color = (0, 0, 255) if name in ["Unknown", "Processing..."] else (0, 255, 0)
-            cv2.rectangle(frame, (left, top), (right, bottom), box_color, 2)
-            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), box_color, cv2.FILLED)
-            font = cv2.FONT_HERSHEY_DUPLEX
-            cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
-
-        # Encode the frame as JPEG
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-
-        # Yield the frame in the correct format for streaming
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    print(f"Known faces loaded successfully for {len(gallery.names)} unique people.")
+    matcher = make_matcher(gallery, MATCHER, TOLERANCE, ANN_INDEX_PATH, ANN_PROBES, RERANK_PATH)
+
+def start_recognition():
+    """Loads faces once and starts a capture + recognition pipeline per camera."""
+    # Worker processes re-import this module, so cameras are only opened
+    # here and never as an import side effect.
+    global worker_pool, scheduler, batch_encoder
+    load_known_faces()
+    for camera_id, camera in CAMERAS.items():
+        cameras.add(camera_id, camera["source"], camera.get("stand_in"))
+    detector = make_detector(FACE_DETECTOR)
+    shared_options = {}
+    if RECOGNITION_PROCESSES > 0:
+        # Shared-memory slots sized for the largest camera frame (BGR, 3 bytes a pixel)
+        frame_bytes = max(width * height * 3 for width, height in
+                          (cameras.get(camera_id).capture.frame_size for camera_id in cameras.camera_ids))
+        worker_pool = RecognitionWorkerPool(RECOGNITION_PROCESSES, slot_bytes=frame_bytes or None).start()
+        detector = worker_pool.detector(FACE_DETECTOR)
+        shared_options["encoder"] = worker_pool.encode_faces
+    elif BATCH_ENCODING:
+        batch_encoder = BatchedFaceEncoder(ENCODING_BATCH_SIZE, ENCODING_MAX_WAIT_MS).start()
+        shared_options["encoder"] = batch_encoder.encode_faces
+    if CROWD_MODE:
+        detector = TiledDetector(detector)
+    if DETECTION_BUDGET:
+        scheduler = DetectionScheduler(DETECTION_BUDGET)
+    # The gallery, matcher, detector models and worker pool are shared; each
+    # camera keeps its own tracks, motion gate and detection scale.
+    for camera_id, camera in CAMERAS.items():
+        entry = cameras.get(camera_id)
+        pipeline_options = dict(shared_options)
+        if scheduler is not None:
+            pipeline_options["scheduler"] = scheduler.register(camera_id, camera.get("sessions", ()))
+        cameras.attach(camera_id, make_pipeline(entry.capture, detector, pipeline_options))
+    print(f"Recognition running on {len(cameras)} camera(s): {', '.join(cameras.camera_ids)}")
+
+def make_pipeline(capture, detector, pipeline_options):
+    """Builds one camera's recognition pipeline around the shared models."""
+    motion_gate = None
+    if MOTION_GATE:
+        motion_gate = MotionGate(idle_after_seconds=IDLE_AFTER_SECONDS, idle_processing_fps=IDLE_PROCESSING_FPS,
+                                 idle_camera_fps=IDLE_CAMERA_FPS, active_camera_fps=ACTIVE_CAMERA_FPS)
+    if CROWD_MODE:
+        scale_controller = AdaptiveScaleController(levels=((1.0, CROWD_UPSAMPLE),), start_level=0)
+    else:
+        scale_controller = AdaptiveScaleController(latency_budget_ms=DETECTION_LATENCY_BUDGET_MS,
+                                                   min_face_pixels=MIN_FACE_PIXELS)
+    region_detector = RegionDetector(detector, ROI_PADDING, FULL_SCAN_EVERY_N, STATIC_ROI)
+    quality_gate = None
+    if QUALITY_GATE:
+        quality_gate = FaceQualityGate(MIN_FACE_SIZE, MIN_SHARPNESS, max_yaw=MAX_FACE_YAW)
+    pipeline_class = RecognitionPipeline
+    if STAGED_PIPELINE:
+        pipeline_class = StagedRecognitionPipeline
+        pipeline_options.update(detect_workers=DETECT_WORKERS, render_workers=RENDER_WORKERS,
+                                stage_queue_size=STAGE_QUEUE_SIZE)
+    return pipeline_class(capture, gallery, matcher, attendance_log, tolerance=TOLERANCE,
+                          confirmation_threshold=CONFIRMATION_THRESHOLD, history_length=HISTORY_LENGTH,
+                          subscriber_queue_size=VIEWER_QUEUE_SIZE, processing_fps=PROCESSING_FPS,
+                          max_missed_frames=MAX_MISSED_FRAMES, reverify_every=REVERIFY_EVERY_N_FRAMES,
+                          detect_every_n=DETECT_EVERY_N_FRAMES, motion_gate=motion_gate,
+                          region_detector=region_detector, scale_controller=scale_controller,
+                          full_resolution_encoding=FULL_RESOLUTION_ENCODING, quality_gate=quality_gate,
+                          **pipeline_options)
+
+def generate_frames(camera_id):
+    """Streams one camera's annotated frames to one viewer."""
+    # Recognition runs once per camera in the background pipeline; each viewer
+    # only receives the already-encoded JPEGs through its own bounded queue.
+    return cameras.get(camera_id).pipeline.frames()
 
 # --- FLASK ROUTES ---
 @app.route('/')
 def index():
     """Renders the main web page."""
-    return render_template('index.html')
+    return render_template('index.html', camera_ids=cameras.camera_ids)
 
 @app.route('/video_feed')
 def video_feed():
-    """Route for the video streaming."""
-    return Response(generate_frames(),
+    """Route for the video streaming (the first camera)."""
+    if not cameras.camera_ids:
+        abort(404)   # No cameras configured
+    return video_feed_camera(cameras.camera_ids[0])
+
+@app.route('/video_feed/<camera_id>')
+def video_feed_camera(camera_id):
+    """Route for one camera's video stream."""
+    entry = cameras.get(camera_id)
+    if entry is None:
+        abort(404)
+    if entry.pipeline is None:
+        abort(503)   # Still starting up
+    return Response(generate_frames(camera_id),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stats')
+def stats():
+    """Runtime counters (e.g. frames dropped by the capture thread)."""
+    stats = {"cameras": cameras.stats()}
+    if worker_pool is not None:
+        stats["workers"] = worker_pool.stats()
+    if batch_encoder is not None:
+        stats["encoder"] = batch_encoder.stats()
+    if scheduler is not None:
+        stats["scheduler"] = scheduler.stats()
+    return jsonify(stats)
+
 # --- MAIN EXECUTION ---
+# Recognition starts with the app and runs headless; viewers are optional.
+#   python app.py                                    (Flask's development server)
+#   gunicorn --workers 1 --threads 8 app:app         (WSGI: the import starts it)
+# Use a single Gunicorn worker without --preload: each worker process would
+# open the cameras itself, and --preload would start them in the master,
+# whose threads do not survive the fork into the worker.
 if __name__ == '__main__':
-    load_known_faces()
+    start_recognition()
     # The 'threaded=True' is important to handle background processing
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+elif __name__ != '__mp_main__':
+    # Imported by a WSGI server. Worker processes import the main script as
+    # __mp_main__ and must not open cameras.
+    start_recognition()
\ No newline at end of file
@@ -0,0 +1,32 @@
+import csv
+import threading
+from datetime import datetime
+
+
+class AttendanceLog:
+    """Thread-safe daily attendance CSV; each student is marked once per session."""
+
+    def __init__(self):
+        self.present_students = []
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Records `name` as present. Returns True if this call marked them."""
+        with self._lock:
+            if name == "Unknown" or name in self.present_students:
+                return False
+            current_time = datetime.now().strftime("%H:%M:%S")
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            attendance_file = f"attendance_{current_date}.csv"
+
+            # Open file within the lock
+            with open(attendance_file, 'a+', newline='') as f:
+                # Move cursor to the start to check if file is empty
+                f.seek(0)
+                if not f.read(1): # Check if file is empty
+                    csv.writer(f).writerow(["Name", "Time"])
+                csv.writer(f).writerow([name, current_time])
+
+            self.present_students.append(name)
+            print(f"STABLE ID: Attendance marked for {name} at {current_time}")
+            return True
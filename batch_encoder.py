@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from crop_encoding import CROP_PADDING, MAX_FACE_PIXELS, compute_descriptors, face_chips
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+MAX_BATCH_SIZE = 32       # Most chips sent through the ResNet in one call
+MAX_WAIT_MS = 10          # Longest a face waits for others to share its batch
+RESULT_TIMEOUT = 30.0
+# ===================================================================
+
+
+class EncodeRequest:
+    """The aligned chips of one frame, waiting for their descriptors."""
+
+    __slots__ = ("chips", "future", "submitted")
+
+    def __init__(self, chips):
+        self.chips = chips
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+
+class BatchedFaceEncoder:
+    """
+    Computes face descriptors for many frames and cameras in shared batches.
+
+    Callers (one per pipeline thread) cut and align their chips themselves,
+    then hand them to a single encoder thread. That thread takes the oldest
+    request, gathers whatever else arrives within `max_wait_ms` of it, up to
+    `max_batch_size` chips, and runs dlib's ResNet once for the lot. A busy
+    crowd fills the batch at once; a lone face waits at most `max_wait_ms`.
+    encode_faces() is a drop-in for crop_encoding.encode_faces.
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 padding=CROP_PADDING, max_face_pixels=MAX_FACE_PIXELS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.padding = padding
+        self.max_face_pixels = max_face_pixels
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.batches = 0
+        self.requests = 0
+        self.faces_encoded = 0
+        self.wait_seconds = 0.0
+        self.largest_batch = 0
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="batch-encoder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def encode_faces(self, bgr_frame, boxes, landmarks=None):
+        """Encodings for full-frame boxes (None where the crop is empty), computed in a shared batch."""
+        chips = face_chips(bgr_frame, boxes, self.padding, self.max_face_pixels, landmarks)
+        wanted = [chip for chip in chips if chip is not None]
+        if not wanted:
+            return [None] * len(chips)
+        request = EncodeRequest(wanted)
+        self._requests.put(request)
+        descriptors = iter(request.future.result(RESULT_TIMEOUT))
+        return [None if chip is None else next(descriptors) for chip in chips]
+
+    def _gather(self, first):
+        """The oldest request plus whatever joins it before its deadline or a full batch."""
+        batch, size = [first], len(first.chips)
+        deadline = first.submitted + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                request = self._requests.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.chips)
+        return batch
+
+    def _run(self):
+        while self._running:
+            try:
+                first = self._requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = self._gather(first)
+            started = time.monotonic()
+            chips = [chip for request in batch for chip in request.chips]
+            try:
+                descriptors = []
+                for start in range(0, len(chips), self.max_batch_size):
+                    descriptors.extend(compute_descriptors(chips[start:start + self.max_batch_size]))
+            except Exception as e:  # Fail the waiting callers, keep serving the others
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.faces_encoded += len(chips)
+                self.wait_seconds += sum(started - request.submitted for request in batch)
+                self.largest_batch = max(self.largest_batch, min(len(chips), self.max_batch_size))
+            offset = 0
+            for request in batch:
+                request.future.set_result(descriptors[offset:offset + len(request.chips)])
+                offset += len(request.chips)
+
+    def stats(self):
+        with self._lock:
+            average_batch = self.faces_encoded / self.batches if self.batches else 0.0
+            average_wait = self.wait_seconds / self.requests if self.requests else 0.0
+            return {"batches": self.batches, "requests": self.requests, "faces_encoded": self.faces_encoded,
+                    "average_batch_size": round(average_batch, 2), "largest_batch": self.largest_batch,
+                    "average_wait_ms": round(average_wait * 1000, 2), "queued": self._requests.qsize(),
+                    "max_batch_size": self.max_batch_size, "max_wait_ms": round(self.max_wait * 1000, 1)}
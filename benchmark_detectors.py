@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+
+import cv2
+
+from encoding_cache import IMAGE_EXTENSIONS
+from face_detectors import DETECTORS, make_detector
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+IMAGES_PATH = "images"
+FRAME_WIDTH = 640         # Images are shrunk to roughly camera-frame size before detection
+# ===================================================================
+
+
+def load_images(images_path, width):
+    """Every enrollment photo as RGB, no wider than `width`. Each should show exactly one face."""
+    images = []
+    for filename in sorted(os.listdir(images_path)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(images_path, filename))
+        if image is None:
+            print(f"Warning: Could not read {filename}, skipping.")
+            continue
+        if image.shape[1] > width:
+            factor = width / image.shape[1]
+            image = cv2.resize(image, (0, 0), fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return images
+
+
+def report(label, results, seconds):
+    found = sum(1 for boxes in results if boxes)
+    exactly_one = sum(1 for boxes in results if len(boxes) == 1)
+    print(f"{label:<12} {seconds / len(results) * 1000:>10.1f} {found / len(results) * 100:>9.1f}% "
+          f"{exactly_one / len(results) * 100:>11.1f}%")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Speed and recall of each face detector backend on the images folder.")
+    parser.add_argument("--images", default=IMAGES_PATH)
+    parser.add_argument("--width", type=int, default=FRAME_WIDTH)
+    parser.add_argument("--upsample", type=int, default=1)
+    parser.add_argument("--backends", default=",".join(DETECTORS), help="Comma-separated: " + ", ".join(DETECTORS))
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.width)
+    if not images:
+        print(f"FATAL: No images found in '{args.images}'. Exiting.")
+        exit()
+    print(f"{len(images)} images, up to {args.width}px wide, upsample {args.upsample}")
+    print(f"{'backend':<12} {'ms/image':>10} {'recall':>10} {'one face':>12}")
+
+    for kind in args.backends.split(","):
+        try:
+            detector = make_detector(kind)
+        except (ValueError, FileNotFoundError, RuntimeError) as error:
+            print(f"{kind:<12} unavailable: {error}")
+            continue
+        start = time.perf_counter()
+        results = [detector(image, args.upsample) for image in images]
+        report(kind, results, time.perf_counter() - start)
+        if kind == "cnn":
+            start = time.perf_counter()
+            results = detector.batch(images, args.upsample)
+            report("cnn (batch)", results, time.perf_counter() - start)
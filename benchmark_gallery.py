@@ -0,0 +1,93 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from encoding_cache import load_known_encodings
+from gallery import FaceGallery
+from quantized_gallery import QuantizedGallery
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+IMAGES_PATH = "images"
+TOLERANCE = 0.50
+# ===================================================================
+
+
+def float64_baseline(encodings, names, queries):
+    """The original matcher: face_distance() on float64 lists, face by face."""
+    known_face_encodings = list(encodings)
+    result = []
+    for query in queries:
+        face_distances = np.linalg.norm(np.asarray(known_face_encodings) - query, axis=1)
+        best_match_index = np.argmin(face_distances)
+        result.append(names[best_match_index] if face_distances[best_match_index] < TOLERANCE else "Unknown")
+    return result
+
+
+def decide(matcher, gallery, queries):
+    rows, distances = matcher.match(queries)
+    return [gallery.name_of(row) if distance < TOLERANCE else "Unknown"
+            for row, distance in zip(rows[:, 0], distances[:, 0])]
+
+
+def time_per_frame(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory, latency and identity agreement of quantized galleries.")
+    parser.add_argument("--images", default=IMAGES_PATH)
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Pad the gallery with this many jittered copies to simulate a large deployment")
+    parser.add_argument("--faces", type=int, default=30, help="Faces per simulated frame")
+    parser.add_argument("--noise", type=float, default=0.02, help="Per-dimension jitter applied to query faces")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    enrolled = [(filename.split('_')[0], encoding) for filename, encoding in load_known_encodings(args.images)
+                if encoding is not None]
+    names = [name for name, _ in enrolled]
+    encodings = np.array([encoding for _, encoding in enrolled])
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        picks = rng.integers(0, len(encodings), args.synthetic)
+        encodings = np.vstack([encodings, encodings[picks] + rng.normal(0, args.noise, (args.synthetic, 128))])
+        names += [f"{names[i]}~{j}" for j, i in enumerate(picks)]
+
+    gallery = FaceGallery(capacity=len(encodings))
+    for name, encoding in zip(names, encodings):
+        gallery.add(name, encoding)
+    queries = encodings[rng.integers(0, len(encodings), args.faces)] + rng.normal(0, args.noise, (args.faces, 128))
+
+    # Quantized modes re-rank from a memory-mapped copy of the float32 rows, as app.py sets them up
+    mapped_gallery = FaceGallery(capacity=len(encodings))
+    for name, encoding in zip(names, encodings):
+        mapped_gallery.add(name, encoding)
+    rerank_path = os.path.join(tempfile.mkdtemp(), "gallery_rerank.npy")
+    mapped_gallery.memory_map(rerank_path)
+
+    # "private" is held by every worker process; "mapped" is one page-cache copy shared by all of them
+    baseline = float64_baseline(encodings, names, queries)
+    print(f"Gallery: {len(encodings)} encodings, {args.faces} faces per frame, tolerance {TOLERANCE}")
+    print(f"{'mode':<10} {'private (KiB)':>14} {'mapped (KiB)':>13} {'ms/frame':>10} {'agreement':>10}")
+    print(f"{'float64':<10} {encodings.nbytes / 1024:>14.1f} {0:>13.1f} "
+          f"{time_per_frame(lambda: float64_baseline(encodings, names, queries), args.repeats):>10.3f} {'100.0%':>10}")
+
+    candidates = [("float32", gallery)] + [(mode, QuantizedGallery(mapped_gallery, mode).build())
+                                           for mode in ("float16", "int8")]
+    for mode, matcher in candidates:
+        if matcher is gallery:
+            private, mapped = gallery.encodings.nbytes, 0
+        else:
+            private, mapped = matcher.private_nbytes, mapped_gallery.encodings.nbytes
+        agreement = np.mean([a == b for a, b in zip(decide(matcher, gallery, queries), baseline)]) * 100
+        latency = time_per_frame(lambda: matcher.match(queries), args.repeats)
+        print(f"{mode:<10} {private / 1024:>14.1f} {mapped / 1024:>13.1f} {latency:>10.3f} {agreement:>9.1f}%")
+    os.remove(rerank_path)
@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+MAX_CORNERS_PER_BOX = 20
+MIN_TRACKED_POINTS = 3    # Fewer surviving points than this and the box is considered lost
+# --- Kalman smoothing (full-frame pixels): detections are trusted more than optical flow ---
+PROCESS_NOISE = 16.0
+DETECTION_NOISE = 64.0
+FLOW_NOISE = 256.0
+# ===================================================================
+
+
+class KalmanBoxFilter:
+    """
+    Constant-velocity Kalman filter over a box's centre and size.
+
+    State is (cx, cy, w, h) plus their per-step velocities. Measurements come
+    from full detections or, between detections, from optical flow (with a
+    larger measurement noise), and the smoothed box is what gets drawn.
+    """
+
+    def __init__(self, box, process_noise=PROCESS_NOISE):
+        self.x = np.zeros(8)
+        self.x[:4] = self._to_state(box)
+        self.P = np.diag([160.0] * 4 + [1600.0] * 4)
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+        self.Q = np.eye(8) * process_noise
+
+    @staticmethod
+    def _to_state(box):
+        top, right, bottom, left = box
+        return np.array([(left + right) / 2, (top + bottom) / 2, right - left, bottom - top], dtype=np.float64)
+
+    @property
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        w, h = max(w, 1.0), max(h, 1.0)
+        return int(round(cy - h / 2)), int(round(cx + w / 2)), int(round(cy + h / 2)), int(round(cx - w / 2))
+
+    def predict(self):
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.box
+
+    def update(self, box, measurement_noise=DETECTION_NOISE):
+        z = self._to_state(box)
+        S = self.H @ self.P @ self.H.T + np.eye(4) * measurement_noise
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self.H @ self.x)
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+        return self.box
+
+
+class OpticalFlowBoxTracker:
+    """
+    Moves face boxes between detections with sparse Lucas-Kanade optical flow.
+
+    reset() seeds corner features inside each box on a detection frame; step()
+    follows them into the next grayscale frame (one calcOpticalFlowPyrLK call
+    for all boxes) and moves each box by the median shift and scale.
+    """
+
+    def __init__(self, max_corners=MAX_CORNERS_PER_BOX):
+        self.max_corners = max_corners
+        self._prev_gray = None
+        self._points = []     # Per box: (n, 1, 2) float32 feature points, or None
+        self._boxes = []
+
+    def reset(self, gray, boxes):
+        self._prev_gray = gray
+        self._boxes = list(boxes)
+        self._points = []
+        for top, right, bottom, left in self._boxes:
+            mask = np.zeros(gray.shape[:2], dtype=np.uint8)
+            mask[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = 255
+            points = cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 3, mask=mask)
+            self._points.append(points if points is not None and len(points) >= MIN_TRACKED_POINTS else None)
+
+    def step(self, gray):
+        """Returns the moved box for each box from reset(), or None where it was lost."""
+        if self._prev_gray is None or not self._boxes:
+            return [None] * len(self._boxes)
+        owners = [i for i, points in enumerate(self._points) if points is not None for _ in range(len(points))]
+        moved = [None] * len(self._boxes)
+        if owners:
+            old = np.concatenate([points for points in self._points if points is not None])
+            new, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, old, None,
+                                                      winSize=(15, 15), maxLevel=2)
+            owners = np.array(owners)
+            ok = status.ravel() == 1
+            for i in range(len(self._boxes)):
+                selected = ok & (owners == i)
+                if selected.sum() < MIN_TRACKED_POINTS:
+                    self._points[i] = None
+                    continue
+                before, after = old[selected].reshape(-1, 2), new[selected].reshape(-1, 2)
+                moved[i] = self._move_box(self._boxes[i], before, after)
+                self._boxes[i] = moved[i]
+                self._points[i] = after.reshape(-1, 1, 2)
+        self._prev_gray = gray
+        return moved
+
+    @staticmethod
+    def _move_box(box, before, after):
+        top, right, bottom, left = box
+        shift_x, shift_y = np.median(after - before, axis=0)
+        spread_before = np.median(np.linalg.norm(before - before.mean(axis=0), axis=1))
+        spread_after = np.median(np.linalg.norm(after - after.mean(axis=0), axis=1))
+        scale = float(np.clip(spread_after / spread_before, 0.8, 1.25)) if spread_before > 0 else 1.0
+        cx, cy = (left + right) / 2 + shift_x, (top + bottom) / 2 + shift_y
+        half_w, half_h = (right - left) * scale / 2, (bottom - top) * scale / 2
+        return int(round(cy - half_h)), int(round(cx + half_w)), int(round(cy + half_h)), int(round(cx - half_w))
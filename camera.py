@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+RECONNECT_DELAY = 1.0        # First wait before reopening a live source that stopped delivering
+MAX_RECONNECT_DELAY = 30.0   # The wait doubles after every failed attempt up to this
+# ===================================================================
+
+
+class LatestFrameCapture:
+    """
+    Drains a cv2.VideoCapture on its own thread into a tiny ring buffer.
+
+    The camera driver queues frames while recognition is busy, which makes the
+    stream lag seconds behind reality. Reading continuously on a dedicated
+    thread and keeping only the newest `buffer_size` frames means read() always
+    hands out the freshest frame; everything older is dropped and counted.
+    read() returns (success, frame) just like cv2.VideoCapture.read().
+
+    With `playback`, a video file stands in for a live camera: it is read at
+    its own frame rate and starts over when it ends. Live sources (device
+    indexes, RTSP/HTTP streams) are reopened with exponential backoff when a
+    read fails, so an unplugged camera or a dropped stream recovers by itself.
+    """
+
+    def __init__(self, source=0, buffer_size=1, playback=False):
+        self.source = source
+        self.playback = playback
+        self._capture = cv2.VideoCapture(source)
+        self._frames = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._sequence = 0          # Number of the newest frame captured
+        self._last_read = 0         # Number of the newest frame handed out
+        self._requested_fps = None  # Applied by the capture thread, which owns the device
+        self.frames_captured = 0
+        self.frames_dropped = 0     # Captured but never handed out
+        self.reconnects = 0
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=f"capture-{self.source}", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        frame_interval = 1.0 / (self._capture.get(cv2.CAP_PROP_FPS) or 25.0) if self.playback else 0.0
+        next_frame_time = time.monotonic()
+        while self._running:
+            if self._requested_fps is not None:
+                fps, self._requested_fps = self._requested_fps, None
+                self._capture.set(cv2.CAP_PROP_FPS, fps)
+            if frame_interval:
+                # Never try to catch up after a stall: that would replay frames in a burst
+                next_frame_time = max(next_frame_time + frame_interval, time.monotonic())
+                time.sleep(max(0.0, next_frame_time - time.monotonic()))
+            success, frame = self._capture.read()
+            if not success and self.playback and self.frames_captured:
+                # End of the stand-in video: loop back to the first frame
+                self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                success, frame = self._capture.read()
+            if not success and not self.playback:
+                success, frame = self._reconnect()
+            if not success:
+                if self._running:   # Not just release() interrupting a reconnect
+                    print(f"Error: Could not read frame from camera {self.source}.")
+                break
+            with self._condition:
+                if len(self._frames) == self._frames.maxlen:
+                    # The oldest buffered frame was never read: it is stale now
+                    self.frames_dropped += 1
+                self._frames.append((self._sequence + 1, frame))
+                self._sequence += 1
+                self.frames_captured += 1
+                self._condition.notify_all()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def _reconnect(self):
+        """Reopens a live source until it delivers a frame again or release() is called."""
+        delay = RECONNECT_DELAY
+        while True:
+            print(f"Warning: Lost camera {self.source}; reconnecting in {delay:g}s.")
+            with self._condition:
+                if self._condition.wait_for(lambda: not self._running, delay):
+                    return False, None
+            self._capture.release()
+            self._capture = cv2.VideoCapture(self.source)
+            success, frame = self._capture.read()
+            if success:
+                self.reconnects += 1
+                print(f"Reconnected to camera {self.source}.")
+                return True, frame
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def read(self, timeout=2.0):
+        """Blocks for a frame newer than the last one read and returns the newest."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._sequence == self._last_read:
+                remaining = deadline - time.monotonic()
+                if not self._running or remaining <= 0:
+                    return False, None
+                self._condition.wait(remaining)
+            sequence, frame = self._frames[-1]
+            # Older frames still buffered are skipped in favour of the newest one
+            self.frames_dropped += sum(1 for s, _ in self._frames if self._last_read < s < sequence)
+            self._frames.clear()
+            self._last_read = sequence
+            return True, frame
+
+    def set_fps(self, fps):
+        """Asks the camera for a new frame rate (drivers that cannot change it ignore this)."""
+        self._requested_fps = fps
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def opened(self):
+        return self._capture.isOpened()
+
+    @property
+    def frame_size(self):
+        """(width, height) the device reports, or (0, 0) before it knows."""
+        return (int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def stats(self):
+        with self._condition:
+            return {"source": str(self.source), "frames_captured": self.frames_captured,
+                    "frames_dropped": self.frames_dropped, "reconnects": self.reconnects, "running": self._running}
+
+    def release(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()   # Wakes a capture thread waiting to reconnect
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self._capture.release()
@@ -0,0 +1,94 @@
+import os
+import threading
+
+from camera import LatestFrameCapture
+
+
+def parse_source(source):
+    """Camera index strings such as "0" become ints; file paths and URLs are kept as they are."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class CameraEntry:
+    """One registered camera: its source, its capture thread and the pipeline reading it."""
+
+    def __init__(self, camera_id, source, capture):
+        self.camera_id = camera_id
+        self.source = source
+        self.capture = capture
+        self.pipeline = None
+
+    def stats(self):
+        return {"source": str(self.source), "capture": self.capture.stats(),
+                "pipeline": self.pipeline.stats() if self.pipeline is not None else None}
+
+
+class CameraRegistry:
+    """
+    Every camera served by this process, by id.
+
+    A source is a camera index, a video file or a stream URL. Video files are
+    played back in real time and looped, so a recording can stand in for a
+    classroom camera. A stream can also name a `stand_in` file that is used
+    when the stream cannot be opened (e.g. a demo without the building
+    network). Each camera gets its own capture thread; the pipelines attached
+    to them can all share one gallery and model set.
+    """
+
+    def __init__(self, buffer_size=1):
+        self.buffer_size = buffer_size
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def _open(self, source):
+        playback = isinstance(source, str) and os.path.isfile(source)
+        return LatestFrameCapture(source, self.buffer_size, playback=playback)
+
+    def add(self, camera_id, source, stand_in=None):
+        """Opens and starts a camera's capture thread; returns its CameraEntry."""
+        if camera_id in self._cameras:
+            raise ValueError(f"Camera '{camera_id}' is already registered")
+        source = parse_source(source)
+        capture = self._open(source)
+        if not capture.opened and stand_in is not None:
+            print(f"Warning: Could not open camera '{camera_id}' ({source}); using stand-in {stand_in}.")
+            capture.release()
+            source = stand_in
+            capture = self._open(source)
+        if not capture.opened:
+            print(f"Warning: Could not open camera '{camera_id}' ({source}).")
+        entry = CameraEntry(camera_id, source, capture.start())
+        with self._lock:
+            self._cameras[camera_id] = entry
+        return entry
+
+    def attach(self, camera_id, pipeline):
+        self._cameras[camera_id].pipeline = pipeline.start()
+        return pipeline
+
+    def get(self, camera_id):
+        """The CameraEntry for `camera_id`, or None."""
+        return self._cameras.get(camera_id)
+
+    @property
+    def camera_ids(self):
+        return list(self._cameras)
+
+    def __len__(self):
+        return len(self._cameras)
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._cameras.values())
+        return {entry.camera_id: entry.stats() for entry in entries}
+
+    def stop_all(self):
+        with self._lock:
+            entries = list(self._cameras.values())
+            self._cameras.clear()
+        for entry in entries:
+            if entry.pipeline is not None:
+                entry.pipeline.stop()
+            entry.capture.release()
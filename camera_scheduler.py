@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+DETECTION_BUDGET = 1.0        # Seconds of detection + encoding work per second, across all cameras (~cores for dlib)
+BURST_SECONDS = 1.0           # Unused budget that may be saved up, in seconds of budget
+MOTION_PRIORITY = 1.0         # Priority added for a camera whose frame just moved
+UNCONFIRMED_PRIORITY = 2.0    # ... for a camera with faces that are not identified yet
+SESSION_PRIORITY = 1.0        # ... for a camera whose room has a class in session
+AGING_PER_SECOND = 1.0        # Priority gained per second a camera has been kept waiting
+STALE_REQUEST_SECONDS = 1.0   # A camera that stopped asking is no longer waiting
+FPS_WINDOW_SECONDS = 10.0     # Window for the achieved detection rate
+# ===================================================================
+
+
+def session_active(sessions, now=None):
+    """True if the time of day falls inside one of the ("HH:MM", "HH:MM") sessions."""
+    clock = (now or datetime.now()).strftime("%H:%M")
+    return any(start <= clock < end for start, end in sessions)
+
+
+class CameraBudget:
+    """One camera's handle on the scheduler; this is what a pipeline is given."""
+
+    def __init__(self, scheduler, camera_id, sessions=()):
+        self.scheduler = scheduler
+        self.camera_id = camera_id
+        self.sessions = list(sessions)
+        # --- Bookkeeping, guarded by the scheduler's lock ---
+        self.waiting_since = None
+        self.last_request = 0.0
+        self.priority = 0.0
+        self.granted = 0
+        self.deferred = 0
+        self.work_seconds = 0.0
+        self.grant_times = deque()
+        self.average_delay = 0.0
+        self.max_delay = 0.0
+
+    def request(self, motion=True, unconfirmed=False):
+        """Asks for one detection slot now; False means follow with flow and ask again next slot."""
+        return self.scheduler.request(self, motion, unconfirmed)
+
+    def withdraw(self):
+        """Stops waiting (e.g. the motion gate skipped the slot)."""
+        self.scheduler.withdraw(self)
+
+    def charge(self, seconds):
+        """Bills the detection + encoding time a granted slot actually took."""
+        self.scheduler.charge(self, seconds)
+
+
+class DetectionScheduler:
+    """
+    Shares one detection budget between every camera in the process.
+
+    The budget is a token bucket filled at `budget` seconds of work per second
+    and drained by the measured time of each detection + encoding slot, so it
+    holds whatever detector, scale or worker pool the cameras use. A camera
+    whose detection is due asks for a slot; it is granted only while budget
+    is left and no waiting camera has a higher priority. Priority comes from
+    motion, faces not yet identified and an active class session, and grows
+    while a camera waits so empty rooms are slowed down, never starved. A
+    camera that is refused keeps following its faces with optical flow.
+    """
+
+    def __init__(self, budget=DETECTION_BUDGET, burst_seconds=BURST_SECONDS):
+        self.budget = budget
+        self.capacity = budget * burst_seconds
+        self._tokens = self.capacity
+        self._refilled_at = time.monotonic()
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def register(self, camera_id, sessions=()):
+        """Returns the CameraBudget a camera's pipeline requests its slots through."""
+        with self._lock:
+            camera = self._cameras[camera_id] = CameraBudget(self, camera_id, sessions)
+        return camera
+
+    @staticmethod
+    def _priority(camera, motion, unconfirmed):
+        priority = 0.0
+        if motion:
+            priority += MOTION_PRIORITY
+        if unconfirmed:
+            priority += UNCONFIRMED_PRIORITY
+        if camera.sessions and session_active(camera.sessions):
+            priority += SESSION_PRIORITY
+        return priority
+
+    @staticmethod
+    def _effective_priority(camera, now):
+        return camera.priority + AGING_PER_SECOND * (now - camera.waiting_since)
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.budget)
+        self._refilled_at = now
+
+    def request(self, camera, motion=True, unconfirmed=False):
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if camera.waiting_since is None:
+                camera.waiting_since = now
+            camera.last_request = now
+            camera.priority = self._priority(camera, motion, unconfirmed)
+            rivals = [self._effective_priority(other, now) for other in self._cameras.values()
+                      if other is not camera and other.waiting_since is not None
+                      and now - other.last_request < STALE_REQUEST_SECONDS]
+            if self._tokens <= 0 or (rivals and max(rivals) > self._effective_priority(camera, now)):
+                camera.deferred += 1
+                return False
+            delay = now - camera.waiting_since
+            camera.waiting_since = None
+            camera.granted += 1
+            camera.average_delay = delay if camera.granted == 1 else 0.9 * camera.average_delay + 0.1 * delay
+            camera.max_delay = max(camera.max_delay, delay)
+            camera.grant_times.append(now)
+            while camera.grant_times and now - camera.grant_times[0] > FPS_WINDOW_SECONDS:
+                camera.grant_times.popleft()
+            return True
+
+    def withdraw(self, camera):
+        with self._lock:
+            camera.waiting_since = None
+
+    def charge(self, camera, seconds):
+        with self._lock:
+            self._tokens -= seconds
+            camera.work_seconds += seconds
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            cameras = {}
+            for camera_id, camera in self._cameras.items():
+                recent = [t for t in camera.grant_times if now - t <= FPS_WINDOW_SECONDS]
+                waiting = camera.waiting_since is not None and now - camera.last_request < STALE_REQUEST_SECONDS
+                cameras[camera_id] = {
+                    "detection_fps": round(len(recent) / FPS_WINDOW_SECONDS, 2),
+                    "queueing_delay_ms": round(camera.average_delay * 1000, 1),
+                    "max_queueing_delay_ms": round(camera.max_delay * 1000, 1),
+                    "waiting": waiting, "priority": round(self._effective_priority(camera, now) if waiting
+                                                          else camera.priority, 2),
+                    "granted": camera.granted, "deferred": camera.deferred,
+                    "work_seconds": round(camera.work_seconds, 3),
+                    "session_active": bool(camera.sessions) and session_active(camera.sessions)}
+            return {"budget": self.budget, "tokens": round(self._tokens, 3), "cameras": cameras}
@@ -0,0 +1,102 @@
+import cv2
+import dlib
+import face_recognition
+import numpy as np
+
+from scale_control import scale_box
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+CROP_PADDING = 0.3        # Margin around each box, as a share of its size, so landmarks have context
+MAX_FACE_PIXELS = 300     # Larger faces are shrunk first: the ResNet only sees a 150x150 chip
+CHIP_SIZE = 150           # Aligned chip fed to dlib's ResNet (what face_encodings uses internally)
+CHIP_PADDING = 0.25
+# ===================================================================
+
+
+def padded_crop(frame, box, padding=CROP_PADDING):
+    """Returns the padded crop around a (top, right, bottom, left) box and the box inside it."""
+    top, right, bottom, left = box
+    pad_y, pad_x = int((bottom - top) * padding), int((right - left) * padding)
+    crop_top, crop_left = max(top - pad_y, 0), max(left - pad_x, 0)
+    crop_bottom = min(bottom + pad_y, frame.shape[0])
+    crop_right = min(right + pad_x, frame.shape[1])
+    crop = frame[crop_top:crop_bottom, crop_left:crop_right]
+    return crop, (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+
+
+def face_landmarks(bgr_frame, box, padding=CROP_PADDING):
+    """
+    dlib's 5-point landmarks of the face at a full-frame box, as five (x, y)
+    full-frame points (two per eye, then the nose tip), or None if the crop
+    is empty. Pass them on to face_chips() to align without predicting again.
+    """
+    crop, (top, right, bottom, left) = padded_crop(bgr_frame, box, padding)
+    if crop.size == 0:
+        return None
+    shape = face_recognition.api.pose_predictor_5_point(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB),
+                                                        dlib.rectangle(left, top, right, bottom))
+    offset_x, offset_y = box[3] - left, box[0] - top
+    return [(point.x + offset_x, point.y + offset_y) for point in shape.parts()]
+
+
+def face_chips(bgr_frame, boxes, padding=CROP_PADDING, max_face_pixels=MAX_FACE_PIXELS, landmarks=None):
+    """
+    Aligned 150x150 RGB face chips for full-frame (top, right, bottom, left)
+    boxes, or None where the crop is empty.
+
+    Each face is cut out of `bgr_frame` with a margin, shrunk if it is larger
+    than the ResNet needs, and aligned on its 5-point landmarks exactly as
+    face_recognition.face_encodings does before computing a descriptor.
+    `landmarks` (from face_landmarks(), one entry or None per box) are reused
+    instead of running the shape predictor again.
+    """
+    chips = []
+    for box, points in zip(boxes, landmarks or [None] * len(boxes)):
+        crop, local_box = padded_crop(bgr_frame, box, padding)
+        if crop.size == 0:
+            chips.append(None)
+            continue
+        origin_x, origin_y = box[3] - local_box[3], box[0] - local_box[0]
+        factor = 1.0
+        face_height = local_box[2] - local_box[0]
+        if face_height > max_face_pixels:
+            factor = max_face_pixels / face_height
+            crop = cv2.resize(crop, (0, 0), fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+            local_box = scale_box(local_box, factor)
+        rgb_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        top, right, bottom, left = local_box
+        rectangle = dlib.rectangle(left, top, right, bottom)
+        if points is None:
+            shape = face_recognition.api.pose_predictor_5_point(rgb_crop, rectangle)
+        else:
+            shape = dlib.full_object_detection(rectangle, [
+                dlib.point(int(round((x - origin_x) * factor)), int(round((y - origin_y) * factor)))
+                for x, y in points])
+        chips.append(dlib.get_face_chip(rgb_crop, shape, size=CHIP_SIZE, padding=CHIP_PADDING))
+    return chips
+
+
+def compute_descriptors(chips):
+    """128-d encodings for aligned chips, computed by one batched ResNet call."""
+    if not chips:
+        return []
+    descriptors = face_recognition.api.face_encoder.compute_face_descriptor(chips)
+    return [np.array(descriptor) for descriptor in descriptors]
+
+
+def encode_faces(bgr_frame, boxes, padding=CROP_PADDING, max_face_pixels=MAX_FACE_PIXELS, landmarks=None):
+    """
+    Encodes faces from padded full-resolution crops of `bgr_frame`.
+
+    `boxes` are (top, right, bottom, left) in full-frame pixels, e.g. found on
+    a downscaled frame and scaled back up. Only the crops are converted to
+    RGB, and landmarks and the 128-d encoding are computed on them, so the
+    ResNet gets a sharp chip without a full-resolution detection pass. All
+    faces of the frame go through the ResNet in one batch. Known `landmarks`
+    skip the shape predictor (see face_chips).
+    """
+    chips = face_chips(bgr_frame, boxes, padding, max_face_pixels, landmarks)
+    descriptors = iter(compute_descriptors([chip for chip in chips if chip is not None]))
+    return [None if chip is None else next(descriptors) for chip in chips]
@@ -0,0 +1,128 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from enrollment import encode_images
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+# The encodings live in one .npz matrix; the manifest records which
+# image each row came from so unchanged images are never re-encoded.
+CACHE_PATH = "encodings_cache.npz"
+MANIFEST_PATH = "encodings_cache.json"
+CACHE_VERSION = 1
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+# ===================================================================
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """Returns the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_cache(cache_path, manifest_path):
+    """Loads the manifest and encoding matrix, or empty ones if missing/stale."""
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != CACHE_VERSION:
+            return {}, np.empty((0, 128))
+        with np.load(cache_path) as data:
+            encodings = data["encodings"]
+        return manifest["entries"], encodings
+    except (OSError, ValueError, KeyError):
+        return {}, np.empty((0, 128))
+
+
+def _write_cache(entries, encodings, cache_path, manifest_path):
+    """Atomically replaces the cache files so a crash never leaves them half-written."""
+    tmp_cache = cache_path + ".tmp.npz"
+    tmp_manifest = manifest_path + ".tmp"
+    np.savez(tmp_cache, encodings=encodings)
+    with open(tmp_manifest, 'w') as f:
+        json.dump({"version": CACHE_VERSION, "entries": entries}, f, indent=1)
+    os.replace(tmp_cache, cache_path)
+    os.replace(tmp_manifest, manifest_path)
+
+
+def load_known_encodings(images_path, cache_path=CACHE_PATH, manifest_path=MANIFEST_PATH, number_of_cpus=1):
+    """
+    Returns a list of (filename, encoding) for every image in images_path.
+    Images whose path, size, mtime (or, failing that, content hash) match the
+    manifest are served from the cache; only new or changed images are encoded,
+    across `number_of_cpus` worker processes (-1 = all cores).
+    The encoding is None for images in which no face was found.
+    """
+    old_entries, old_encodings = _read_cache(cache_path, manifest_path)
+    cached = {}
+    pending = {}
+
+    # --- Pass 1: decide which images can be served from the cache ---
+    for filename in sorted(os.listdir(images_path)):
+        if not filename.endswith(IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(images_path, filename)
+        stat = os.stat(image_path)
+        entry = old_entries.get(image_path)
+        sha1 = None
+
+        # Fast path: size and mtime unchanged. Otherwise fall back to the
+        # content hash so a touched-but-identical file is still a hit.
+        hit = entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+        if entry is not None and not hit:
+            sha1 = file_sha1(image_path)
+            hit = entry["sha1"] == sha1
+
+        if hit:
+            encoding = old_encodings[entry["row"]] if entry["row"] >= 0 else None
+            cached[image_path] = (stat, entry["sha1"], encoding)
+        else:
+            pending[image_path] = (stat, sha1 or file_sha1(image_path))
+
+    # --- Pass 2: encode new/changed images, streaming results as they finish ---
+    hits = len(cached)
+    failed = 0
+    for image_path, encoding, error in encode_images(list(pending), number_of_cpus):
+        stat, sha1 = pending[image_path]
+        if encoding is None and error != "No face found":
+            # Unreadable files are reported and retried on the next start
+            print(f"Warning: Could not encode {os.path.basename(image_path)}: {error}")
+            failed += 1
+            continue
+        cached[image_path] = (stat, sha1, encoding)
+
+    # --- Assemble results and the new manifest in a stable (sorted) order ---
+    new_entries = {}
+    new_encodings = []
+    results = []
+    for image_path in sorted(cached):
+        stat, sha1, encoding = cached[image_path]
+        row = -1
+        if encoding is not None:
+            row = len(new_encodings)
+            new_encodings.append(encoding)
+        new_entries[image_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1, "row": row}
+        results.append((os.path.basename(image_path), encoding))
+
+    if new_entries != old_entries:
+        matrix = np.array(new_encodings) if new_encodings else np.empty((0, 128))
+        _write_cache(new_entries, matrix, cache_path, manifest_path)
+    print(f"Encoding cache: {hits} cached, {len(pending) - failed} (re)encoded, {failed} failed.")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Encode the image folder into the on-disk encoding cache.")
+    parser.add_argument("--images", default="images", help="Folder of <name>_<n>.jpg images")
+    parser.add_argument("--workers", type=int, default=-1, help="Worker processes (-1 = all cores)")
+    args = parser.parse_args()
+    results = load_known_encodings(args.images, number_of_cpus=args.workers)
+    print(f"Enrolled {sum(encoding is not None for _, encoding in results)} of {len(results)} images.")
@@ -0,0 +1,51 @@
+import multiprocessing
+
+import face_recognition
+
+
+def encode_image(image_path):
+    """Returns the first face encoding in an image, or None if no face is found."""
+    student_image = face_recognition.load_image_file(image_path)
+    try:
+        return face_recognition.face_encodings(student_image)[0]
+    except IndexError:
+        return None
+
+
+def _enroll_one(image_path):
+    """Pool worker: returns (image_path, encoding, error) without ever raising."""
+    try:
+        encoding = encode_image(image_path)
+    except Exception as e:  # An unreadable file must not take down the pool
+        return image_path, None, f"{type(e).__name__}: {e}"
+    if encoding is None:
+        return image_path, None, "No face found"
+    return image_path, encoding, None
+
+
+def encode_images(image_paths, number_of_cpus=1):
+    """
+    Yields (image_path, encoding, error) for each image as soon as it is done.
+    number_of_cpus=1 encodes in-process, -1 uses every core. Failures such as
+    "No face found" are reported through `error` and never stop the pool.
+    """
+    if number_of_cpus == 1 or len(image_paths) <= 1:
+        for image_path in image_paths:
+            yield _enroll_one(image_path)
+        return
+
+    processes = None if number_of_cpus == -1 else number_of_cpus
+
+    # macOS will crash due to a bug in libdispatch if you don't use 'forkserver'.
+    # Preloading this module (instead of the default '__main__') loads the dlib
+    # models once in the server. Workers still import the main script as
+    # __mp_main__, so scripts that use a pool must not open cameras on import.
+    context = multiprocessing
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["enrollment"])
+
+    with context.Pool(processes=processes) as pool:
+        for result in pool.imap_unordered(_enroll_one, image_paths):
+            yield result
+
@@ -0,0 +1,110 @@
+import os
+import threading
+
+import cv2
+import face_recognition
+import numpy as np
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+# Cascades are looked up in OpenCV's bundled cv2/data folder unless a path is given
+CASCADE_FILE = "haarcascade_frontalface_default.xml"
+CASCADE_SCALE_FACTOR = 1.1
+CASCADE_MIN_NEIGHBORS = 5
+CASCADE_MIN_SIZE = 20         # Smallest face side in pixels the cascade looks for
+CNN_BATCH_SIZE = 32
+# ===================================================================
+
+
+class HOGDetector:
+    """dlib's HOG + linear SVM detector: the default, CPU friendly."""
+
+    name = "hog"
+
+    def __call__(self, rgb_image, upsample=1):
+        return face_recognition.face_locations(rgb_image, upsample, model="hog")
+
+    def batch(self, rgb_images, upsample=1):
+        return [self(image, upsample) for image in rgb_images]
+
+
+class CascadeDetector:
+    """
+    OpenCV Haar or LBP cascade: much faster than HOG, but more false positives
+    and it only finds fairly frontal faces. `cascade` is a file name inside
+    cv2/data or a path to any cascade XML (e.g. lbpcascade_frontalface_improved.xml).
+    """
+
+    name = "haar"
+
+    def __init__(self, cascade=CASCADE_FILE, scale_factor=CASCADE_SCALE_FACTOR,
+                 min_neighbors=CASCADE_MIN_NEIGHBORS, min_size=CASCADE_MIN_SIZE):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise RuntimeError("This OpenCV build has no CascadeClassifier (OpenCV 5 moved it to contrib)")
+        self.path = cascade if os.path.isfile(cascade) else os.path.join(cv2.data.haarcascades, cascade)
+        if cv2.CascadeClassifier(self.path).empty():
+            raise FileNotFoundError(f"Could not load face cascade {self.path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self._local = threading.local()   # CascadeClassifier is not safe to share between threads
+
+    def _classifier(self):
+        if not hasattr(self._local, "classifier"):
+            self._local.classifier = cv2.CascadeClassifier(self.path)
+        return self._local.classifier
+
+    def __call__(self, rgb_image, upsample=1):
+        gray = cv2.equalizeHist(cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY))
+        # The cascade's pyramid already covers small faces down to min_size;
+        # "upsample" just lowers that limit to match HOG's meaning of it.
+        min_side = max(int(self.min_size / 2 ** upsample), 8)
+        rects = self._classifier().detectMultiScale(gray, self.scale_factor, self.min_neighbors,
+                                                    minSize=(min_side, min_side))
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in rects]
+
+    def batch(self, rgb_images, upsample=1):
+        return [self(image, upsample) for image in rgb_images]
+
+
+class CNNDetector:
+    """
+    dlib's CNN (MMOD) detector: best recall, but slow without a GPU. batch()
+    runs many images through batch_face_locations in one call, which is how
+    it should be used for offline work such as enrollment.
+    """
+
+    name = "cnn"
+
+    def __init__(self, batch_size=CNN_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def __call__(self, rgb_image, upsample=1):
+        return face_recognition.face_locations(rgb_image, upsample, model="cnn")
+
+    def batch(self, rgb_images, upsample=1):
+        if not rgb_images:
+            return []
+        # batch_face_locations needs equally sized images: pad to a common
+        # canvas at the top-left, so boxes stay valid in each original image.
+        height = max(image.shape[0] for image in rgb_images)
+        width = max(image.shape[1] for image in rgb_images)
+        canvases = []
+        for image in rgb_images:
+            canvas = np.zeros((height, width, 3), dtype=np.uint8)
+            canvas[:image.shape[0], :image.shape[1]] = image
+            canvases.append(canvas)
+        found = face_recognition.batch_face_locations(canvases, upsample, self.batch_size)
+        return [[box for box in boxes if box[0] < image.shape[0] and box[3] < image.shape[1]]
+                for image, boxes in zip(rgb_images, found)]
+
+
+DETECTORS = {"hog": HOGDetector, "haar": CascadeDetector, "cnn": CNNDetector}
+
+
+def make_detector(kind="hog", **options):
+    """Returns a detector callable as detector(rgb_image, upsample) -> [(top, right, bottom, left)]."""
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown face detector {kind!r}; choose from {', '.join(DETECTORS)}")
+    return DETECTORS[kind](**options)
@@ -0,0 +1,100 @@
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from crop_encoding import face_landmarks, padded_crop
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+MIN_FACE_SIZE = 40        # Face height in full-frame pixels below which encodings are unreliable
+MIN_SHARPNESS = 60.0      # Laplacian variance of the face, normalised to SHARPNESS_SIZE
+SHARPNESS_SIZE = 64
+MIN_BRIGHTNESS = 40       # Mean gray level of the face (0-255)
+MAX_BRIGHTNESS = 220
+MAX_YAW = 0.6             # 0 = frontal, 1 = full profile (from 5-point landmarks); None disables
+# ===================================================================
+
+
+def yaw_score(points):
+    """
+    0 for a frontal face up to 1 for a profile, from where the nose sits
+    between the eyes. `points` are the 5 landmarks from face_landmarks().
+    """
+    right_eye = np.mean(points[0:2], axis=0)
+    left_eye = np.mean(points[2:4], axis=0)
+    nose = np.asarray(points[4], dtype=np.float64)
+    eye_span = np.linalg.norm(right_eye - left_eye)
+    if eye_span == 0:
+        return 1.0
+    # Project the nose onto the eye line: 0.5 means it sits exactly between the eyes
+    position = np.dot(nose - left_eye, right_eye - left_eye) / eye_span ** 2
+    return float(min(abs(position - 0.5) * 2, 1.0))
+
+
+class FaceQualityGate:
+    """
+    Cheap checks that reject faces not worth a ResNet encoding.
+
+    check() returns None for a usable face, or the reason it was rejected:
+    "too_small", "blurry", "too_dark", "too_bright" or "profile". Rejections
+    are counted per reason. The yaw check needs dlib's 5-point landmarks, so
+    it runs last and only when `max_yaw` is set; assess() hands those
+    landmarks back so the encoder can align the chip without predicting them
+    again.
+    """
+
+    def __init__(self, min_face_size=MIN_FACE_SIZE, min_sharpness=MIN_SHARPNESS, min_brightness=MIN_BRIGHTNESS,
+                 max_brightness=MAX_BRIGHTNESS, max_yaw=MAX_YAW):
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_yaw = max_yaw
+        self.passed = 0
+        self.skipped = Counter()
+
+    def _reason(self, bgr_frame, box):
+        """Returns (reason, landmarks); landmarks are only computed by the yaw check."""
+        top, right, bottom, left = box
+        if min(bottom - top, right - left) < self.min_face_size:
+            return "too_small", None
+        face, _ = padded_crop(bgr_frame, box, padding=0.0)
+        if face.size == 0:
+            return "too_small", None
+        gray = cv2.resize(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY), (SHARPNESS_SIZE, SHARPNESS_SIZE),
+                          interpolation=cv2.INTER_AREA)
+        brightness = float(gray.mean())
+        if brightness < self.min_brightness:
+            return "too_dark", None
+        if brightness > self.max_brightness:
+            return "too_bright", None
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < self.min_sharpness:
+            return "blurry", None
+        if self.max_yaw is not None:
+            landmarks = face_landmarks(bgr_frame, box)   # Same padded crop the encoder uses
+            if landmarks is None or yaw_score(landmarks) > self.max_yaw:
+                return "profile", None
+            return None, landmarks
+        return None, None
+
+    def assess(self, bgr_frame, box):
+        """
+        Returns (reason, landmarks) for the face at `box` (full-frame pixels):
+        reason is None if it is worth encoding, and landmarks are its 5-point
+        landmarks when the yaw check computed them (else None).
+        """
+        reason, landmarks = self._reason(bgr_frame, box)
+        if reason is None:
+            self.passed += 1
+        else:
+            self.skipped[reason] += 1
+        return reason, landmarks
+
+    def check(self, bgr_frame, box):
+        """Returns None if the face at `box` (full-frame pixels) is worth encoding, else why not."""
+        return self.assess(bgr_frame, box)[0]
+
+    def stats(self):
+        return {"passed": self.passed, "skipped": dict(self.skipped)}
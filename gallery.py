@@ -0,0 +1,186 @@
+import os
+import threading
+
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+def squared_distances(queries, points, point_sq_norms):
+    """Squared euclidean distances (queries x points) via one GEMM."""
+    sq = queries @ points.T
+    sq *= -2.0
+    sq += point_sq_norms
+    sq += np.einsum('ij,ij->i', queries, queries)[:, None]
+    return np.maximum(sq, 0.0, out=sq)
+
+
+class FaceGallery:
+    """
+    Known faces stored as one contiguous float32 matrix.
+
+    Row i of `encodings` belongs to the person `names[labels[i]]`. Storage is
+    preallocated and grows by doubling, so appends are amortized O(1). Squared
+    norms are kept alongside each row so that matching a whole frame is one
+    GEMM: |q - g|^2 = |q|^2 + |g|^2 - 2 q.g
+    """
+
+    def __init__(self, capacity=64):
+        capacity = max(int(capacity), 1)
+        self._matrix = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        self._labels = np.zeros(capacity, dtype=np.int32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._gemm_buffer = np.zeros(0, dtype=np.float32)   # Reused faces x gallery output
+        self._size = 0
+        self.version = 0           # Bumped on every change so derived indexes can detect staleness
+        self.names = []            # Name table: label -> name
+        self._label_of_name = {}   # Reverse lookup: name -> label
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    # --- Zero-copy views for matchers (valid until the next add/remove) ---
+    @property
+    def encodings(self):
+        return self._matrix[:self._size]
+
+    @property
+    def labels(self):
+        return self._labels[:self._size]
+
+    @property
+    def memory_mapped(self):
+        return isinstance(self._matrix, np.memmap)
+
+    def memory_map(self, path):
+        """
+        Moves the encodings into a .npy file at `path` and maps it.
+
+        Every process mapping the same file shares one copy through the page
+        cache instead of each holding a private float32 matrix. A file with
+        identical contents is reused, so Gunicorn workers end up on the same
+        pages. Growing past the mapped rows copies the matrix back into memory.
+        """
+        with self._lock:
+            if self._size == 0:
+                return
+            encodings = self._matrix[:self._size]
+            try:
+                existing = np.load(path, mmap_mode="r")
+                reusable = existing.shape == encodings.shape and np.array_equal(existing, encodings)
+                del existing
+            except (OSError, ValueError):
+                reusable = False
+            if not reusable:
+                tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, encodings)
+                os.replace(tmp_path, path)
+            # Copy-on-write: the gallery never writes mapped rows, but remove() may
+            self._matrix = np.load(path, mmap_mode="c")
+
+    def name_of(self, row):
+        return self.names[self._labels[row]]
+
+    def _grow(self, needed):
+        capacity = len(self._matrix)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        for attr, dtype in (("_labels", np.int32), ("_sq_norms", np.float32)):
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[:self._size] = getattr(self, attr)[:self._size]
+            setattr(self, attr, grown)
+
+    def add(self, name, encoding):
+        """Appends one encoding for `name` and returns its row."""
+        with self._lock:
+            self._grow(self._size + 1)
+            label = self._label_of_name.get(name)
+            if label is None:
+                label = len(self.names)
+                self.names.append(name)
+                self._label_of_name[name] = label
+            row = self._size
+            self._matrix[row] = encoding
+            self._labels[row] = label
+            self._sq_norms[row] = np.dot(self._matrix[row], self._matrix[row])
+            self._size += 1
+            self.version += 1
+            return row
+
+    def remove(self, row):
+        """Removes one row in O(1) by moving the last row into its place."""
+        with self._lock:
+            if not 0 <= row < self._size:
+                raise IndexError(f"Gallery row {row} out of range")
+            last = self._size - 1
+            self._matrix[row] = self._matrix[last]
+            self._labels[row] = self._labels[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._size = last
+            self.version += 1
+
+    def remove_name(self, name):
+        """Removes every encoding of `name`. The name keeps its label slot."""
+        label = self._label_of_name.get(name)
+        if label is None:
+            return 0
+        with self._lock:
+            keep = self._labels[:self._size] != label
+            removed = self._size - int(keep.sum())
+            kept = self._size - removed
+            self._matrix[:kept] = self._matrix[:self._size][keep]
+            self._labels[:kept] = self._labels[:self._size][keep]
+            self._sq_norms[:kept] = self._sq_norms[:self._size][keep]
+            self._size = kept
+            self.version += 1
+            return removed
+
+    def match(self, face_encodings, top_k=1):
+        """
+        Matches every face in a frame against the whole gallery at once.
+        Returns (rows, distances), each shaped (faces, k) and sorted nearest
+        first, where k = min(top_k, len(gallery)).
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        faces = len(queries)
+        with self._lock:
+            n = self._size
+            k = min(top_k, n)
+            if faces == 0 or k == 0:
+                return np.empty((faces, k), dtype=np.intp), np.empty((faces, k), dtype=np.float32)
+
+            # One GEMM for the faces x gallery dot products, written into a
+            # reused contiguous buffer, then expanded to squared distances.
+            if len(self._gemm_buffer) < faces * n:
+                self._gemm_buffer = np.zeros(max(faces * n, 2 * len(self._gemm_buffer)), dtype=np.float32)
+            sq_distances = self._gemm_buffer[:faces * n].reshape(faces, n)
+            np.dot(queries, self._matrix[:n].T, out=sq_distances)
+            sq_distances *= -2.0
+            sq_distances += self._sq_norms[:n]
+            sq_distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+            np.maximum(sq_distances, 0.0, out=sq_distances)   # Clamp rounding below zero
+
+            if k == 1:
+                rows = np.argmin(sq_distances, axis=1)[:, None]
+            else:
+                if k < n:
+                    rows = np.argpartition(sq_distances, k - 1, axis=1)[:, :k]
+                else:
+                    rows = np.broadcast_to(np.arange(n), (faces, n))
+                order = np.argsort(np.take_along_axis(sq_distances, rows, axis=1), axis=1)
+                rows = np.take_along_axis(rows, order, axis=1)
+            distances = np.sqrt(np.take_along_axis(sq_distances, rows, axis=1))
+            return rows, distances
+
+    def best_match(self, face_encoding):
+        """Returns (row, distance) of the closest known encoding, or (-1, inf) if empty."""
+        rows, distances = self.match([face_encoding])
+        if rows.shape[1] == 0:
+            return -1, float("inf")
+        return int(rows[0, 0]), float(distances[0, 0])
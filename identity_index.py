@@ -0,0 +1,108 @@
+import numpy as np
+
+from gallery import ENCODING_SIZE, squared_distances
+
+
+class IdentityCentroidIndex:
+    """
+    Two-stage matcher: one centroid per identity, then that identity's images.
+
+    Stage one compares a face against every identity's centroid. Stage two
+    refines against individual embeddings of the identities in order of
+    the lower bound |q - centroid| - radius (radius = farthest own image from
+    the centroid). By the triangle inequality no image of an identity can be
+    closer than that bound, so refinement stops as soon as the bound exceeds
+    the best distance found. The result is therefore identical to brute force,
+    while typically only one or two identities' images are ever compared.
+
+    With max_distance set (e.g. to TOLERANCE), identities whose bound is already
+    beyond it are never refined; faces with no image that close come back as
+    row -1 / distance inf, which the caller treats as "Unknown" either way.
+    """
+
+    def __init__(self, gallery, max_distance=None):
+        self.gallery = gallery
+        self.max_distance = max_distance
+        self._gallery_version = None
+        self._centroids = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self._centroid_sq_norms = np.empty(0, dtype=np.float32)
+        self._radii = np.empty(0, dtype=np.float32)
+        self._rows = np.empty(0, dtype=np.intp)       # Gallery rows, grouped by identity
+        self._offsets = np.zeros(1, dtype=np.intp)    # Identity i is _rows[_offsets[i]:_offsets[i+1]]
+        self._vectors = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+
+    def build(self):
+        """Computes per-identity centroids and radii from the current gallery."""
+        encodings = self.gallery.encodings
+        labels = self.gallery.labels
+        self._gallery_version = self.gallery.version
+        # Labels can have gaps after remove_name(); keep only identities with rows
+        present, dense_labels = np.unique(labels, return_inverse=True)
+        self._rows = np.argsort(dense_labels, kind='stable')
+        counts = np.bincount(dense_labels, minlength=len(present))
+        self._offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.intp)
+        self._vectors = np.ascontiguousarray(encodings[self._rows], dtype=np.float32)
+        self._sq_norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+
+        self._centroids = np.zeros((len(present), ENCODING_SIZE), dtype=np.float32)
+        self._radii = np.zeros(len(present), dtype=np.float32)
+        for i in range(len(present)):
+            members = self._vectors[self._offsets[i]:self._offsets[i + 1]]
+            self._centroids[i] = members.mean(axis=0)
+            # Float32 rounding margin keeps the bound conservative
+            self._radii[i] = np.linalg.norm(members - self._centroids[i], axis=1).max() + 1e-4
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self._centroids, self._centroids)
+        return self
+
+    def is_stale(self):
+        return self._gallery_version != self.gallery.version
+
+    def match(self, face_encodings, top_k=1):
+        """
+        Returns (rows, distances), each shaped (faces, k), nearest first,
+        exactly as FaceGallery.match() would (within max_distance, if set).
+        """
+        if self.is_stale():
+            return self.gallery.match(face_encodings, top_k)
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        faces = len(queries)
+        k = min(top_k, len(self._rows))
+        rows = np.full((faces, k), -1, dtype=np.intp)
+        distances = np.full((faces, k), np.inf, dtype=np.float32)
+        if faces == 0 or k == 0:
+            return rows, distances
+
+        # --- Stage one: every face against every identity centroid ---
+        lower_bounds = np.sqrt(squared_distances(queries, self._centroids, self._centroid_sq_norms))
+        lower_bounds -= self._radii
+
+        # --- Stage two: refine identities in order of their bound, in doubling
+        # batches, until the bound rules out every remaining identity ---
+        for i in range(faces):
+            query = queries[i:i + 1]
+            order = np.argsort(lower_bounds[i])
+            bounds = lower_bounds[i, order]
+            if self.max_distance is not None:
+                # No image of these identities can come within max_distance
+                order = order[bounds < self.max_distance]
+            best_rows = np.empty(0, dtype=np.intp)
+            best_sq = np.empty(0, dtype=np.float32)
+            done, batch = 0, 1
+            while done < len(order):
+                bound = bounds[done]
+                if len(best_sq) == k and bound > 0 and bound * bound > best_sq[-1]:
+                    break
+                identities = order[done:done + batch]
+                candidates = np.concatenate([np.arange(self._offsets[p], self._offsets[p + 1]) for p in identities])
+                sq = squared_distances(query, self._vectors[candidates], self._sq_norms[candidates])[0]
+                best_rows = np.concatenate((best_rows, candidates))
+                best_sq = np.concatenate((best_sq, sq))
+                keep = np.argsort(best_sq, kind='stable')[:k]
+                best_rows, best_sq = best_rows[keep], best_sq[keep]
+                done += len(identities)
+                batch *= 2
+            found = len(best_rows)
+            rows[i, :found] = self._rows[best_rows]
+            distances[i, :found] = np.sqrt(best_sq)
+        return rows, distances
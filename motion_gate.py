@@ -0,0 +1,74 @@
+import time
+
+import cv2
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+GATE_WIDTH = 160              # Frames are compared at this width, in grayscale
+PIXEL_THRESHOLD = 25          # Per-pixel brightness change that counts as "changed"
+MIN_CHANGED_FRACTION = 0.002  # Fraction of changed pixels that counts as motion
+BACKGROUND_RATE = 0.05        # Share of each frame blended into the reference background
+MAX_SKIP_SECONDS = 10.0       # Detect at least this often even in a perfectly still scene
+# --- Idle duty cycle ---
+IDLE_AFTER_SECONDS = 60.0     # No motion for this long => idle
+IDLE_PROCESSING_FPS = 5.0     # Processing cadence while idle (also how fast motion is noticed)
+IDLE_CAMERA_FPS = 5           # Camera rate requested while idle
+ACTIVE_CAMERA_FPS = 30        # Camera rate restored as soon as motion returns
+# ===================================================================
+
+
+class MotionGate:
+    """
+    Cheap frame-difference gate in front of face detection.
+
+    update() compares a tiny blurred grayscale copy of each processed frame
+    with a slowly updated background (a running average of past frames);
+    when too few pixels differ, detection can be skipped. Comparing with the
+    previous frame instead would miss someone creeping in slower than
+    `pixel_threshold` per frame, while the background still lets lighting
+    changes and people who stay put fade in after a few seconds.
+
+    After `idle_after_seconds` without motion the gate reports idle, so the
+    pipeline drops to the idle processing cadence and camera FPS, and the
+    first frame with motion brings it straight back to full rate.
+    """
+
+    def __init__(self, width=GATE_WIDTH, pixel_threshold=PIXEL_THRESHOLD, min_changed_fraction=MIN_CHANGED_FRACTION,
+                 background_rate=BACKGROUND_RATE, max_skip_seconds=MAX_SKIP_SECONDS,
+                 idle_after_seconds=IDLE_AFTER_SECONDS, idle_processing_fps=IDLE_PROCESSING_FPS,
+                 idle_camera_fps=IDLE_CAMERA_FPS, active_camera_fps=ACTIVE_CAMERA_FPS):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.background_rate = background_rate
+        self.max_skip_seconds = max_skip_seconds
+        self.idle_after_seconds = idle_after_seconds
+        self.idle_processing_fps = idle_processing_fps
+        self.idle_camera_fps = idle_camera_fps
+        self.active_camera_fps = active_camera_fps
+        self._background = None       # float32 running average of the gray frames
+        self.last_motion_time = time.monotonic()
+        self.changed_fraction = 0.0
+
+    def update(self, bgr_frame):
+        """Returns True if this frame differs enough from the background."""
+        height = max(1, round(bgr_frame.shape[0] * self.width / bgr_frame.shape[1]))
+        gray = cv2.cvtColor(cv2.resize(bgr_frame, (self.width, height), interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype("float32")
+            motion = True
+        else:
+            changed = cv2.absdiff(gray, cv2.convertScaleAbs(self._background)) > self.pixel_threshold
+            self.changed_fraction = float(changed.mean())
+            motion = self.changed_fraction >= self.min_changed_fraction
+            cv2.accumulateWeighted(gray, self._background, self.background_rate)
+        if motion:
+            self.last_motion_time = time.monotonic()
+        return motion
+
+    @property
+    def idle(self):
+        return time.monotonic() - self.last_motion_time >= self.idle_after_seconds
@@ -0,0 +1,292 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+RECOGNITION_PROCESSES = 2
+RING_SLOTS_PER_PROCESS = 2    # Frames that can be in flight per worker process
+RESULT_TIMEOUT = 30.0
+HEALTH_CHECK_SECONDS = 0.5    # How often the collector looks for crashed workers
+# ===================================================================
+
+
+class SharedFrameRing:
+    """
+    Fixed-size frame slots in one multiprocessing.shared_memory block.
+
+    write() copies an image into a free slot and returns the slot number;
+    worker processes map the same block and read the pixels in place, so
+    frames never get pickled. A slot stays taken until release().
+    """
+
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.memory = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = list(range(slots))
+        self._condition = threading.Condition()
+        self.writers = 0          # Callers between picking this ring and write(); guarded by the pool
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def idle(self):
+        with self._condition:
+            return len(self._free) == self.slots
+
+    def write(self, image, timeout=RESULT_TIMEOUT):
+        if image.nbytes > self.slot_bytes:
+            raise ValueError(f"Image of {image.nbytes} bytes does not fit a {self.slot_bytes}-byte ring slot")
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._free, timeout):
+                raise TimeoutError("No free shared-memory slot")
+            slot = self._free.pop()
+        view = np.ndarray(image.shape, dtype=image.dtype, buffer=self.memory.buf, offset=slot * self.slot_bytes)
+        view[...] = image
+        return slot
+
+    def release(self, slot):
+        with self._condition:
+            self._free.append(slot)
+            self._condition.notify()
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _worker_main(tasks, results):
+    """Worker process: detects or encodes images straight out of the shared ring."""
+    # Imported here so only the workers (preloaded by the forkserver) pay for dlib's models
+    from crop_encoding import encode_faces
+    from face_detectors import make_detector
+
+    memory = None
+    detectors = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, kind, memory_name, slot, slot_bytes, shape, dtype, options = task
+            try:
+                if memory is None or memory.name != memory_name:
+                    # The pool moved to a bigger ring; this queue's later tasks all use it
+                    if memory is not None:
+                        memory.close()
+                    memory = shared_memory.SharedMemory(name=memory_name)
+                image = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=slot * slot_bytes)
+                if kind == "detect":
+                    detector_kind = options["detector"]
+                    if detector_kind not in detectors:
+                        detectors[detector_kind] = make_detector(detector_kind)
+                    result = [tuple(int(value) for value in box)
+                              for box in detectors[detector_kind](image, options["upsample"])]
+                else:
+                    result = encode_faces(image, options["boxes"], landmarks=options["landmarks"])
+                del image   # Release the view before the slot is reused
+                results.put((task_id, result, None))
+            except Exception as e:  # Reported to the caller, the worker keeps going
+                results.put((task_id, None, f"{type(e).__name__}: {e}"))
+    finally:
+        if memory is not None:
+            memory.close()
+
+
+class RemoteDetector:
+    """A detector callable whose work runs in the pool's worker processes."""
+
+    def __init__(self, pool, kind):
+        self.pool = pool
+        self.kind = kind
+
+    def __call__(self, rgb_image, upsample=1):
+        return self.pool.submit("detect", rgb_image, detector=self.kind, upsample=upsample).result(RESULT_TIMEOUT)
+
+    def batch(self, rgb_images, upsample=1):
+        futures = [self.pool.submit("detect", image, detector=self.kind, upsample=upsample) for image in rgb_images]
+        return [future.result(RESULT_TIMEOUT) for future in futures]
+
+
+class RecognitionWorkerPool:
+    """
+    Runs dlib detection and encoding in separate worker processes.
+
+    Flask, MJPEG streaming and the pipeline threads stay in the main process
+    and no longer compete with dlib for the GIL. Frames travel through a
+    SharedFrameRing; only the task (slot, shape, boxes) and the result
+    (boxes or 128-d encodings) are pickled. One pool is meant to be shared by
+    every camera, so with several cameras submitting at once throughput grows
+    with the number of processes.
+
+    Ring slots are sized for `slot_bytes` (the largest camera frame), or for
+    the first image when it is None, and the ring is reallocated if a bigger
+    image turns up. Each worker has its own task queue, so when one crashes
+    only its own tasks fail and it is started again.
+    """
+
+    def __init__(self, processes=RECOGNITION_PROCESSES, slots_per_process=RING_SLOTS_PER_PROCESS,
+                 slot_bytes=None):
+        self.processes = processes
+        self.slots = processes * slots_per_process
+        self.slot_bytes = slot_bytes
+        self.ring = None
+        self._retired_rings = []
+        # As in enrollment: the forkserver preloads only this module. Workers
+        # still import the main script as __mp_main__, so it must not open
+        # cameras on import.
+        self._context = multiprocessing
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context("forkserver")
+            self._context.set_forkserver_preload(["process_workers"])
+        self._results = self._context.Queue()
+        self._workers = [None] * processes
+        self._task_queues = [None] * processes
+        self._pending = {}       # task id -> (future, ring, slot, worker index, worker's task queue)
+        self._load = [0] * processes
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector = None
+        self._running = False
+        self.tasks_done = 0
+        self.tasks_failed = 0
+        self.workers_restarted = 0
+
+    def _spawn(self, index):
+        self._task_queues[index] = self._context.Queue()
+        worker = self._context.Process(target=_worker_main, name=f"recognition-worker-{index}", daemon=True,
+                                       args=(self._task_queues[index], self._results))
+        worker.start()
+        self._workers[index] = worker
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            for index in range(self.processes):
+                self._spawn(index)
+            self._collector = threading.Thread(target=self._collect, name="recognition-results", daemon=True)
+            self._collector.start()
+        return self
+
+    def _ring_for(self, image):
+        """The current ring, replaced by a bigger one first if `image` does not fit."""
+        with self._lock:
+            if self.ring is None or image.nbytes > self.ring.slot_bytes:
+                slot_bytes = max(image.nbytes, self.slot_bytes or 0)
+                if self.ring is not None:
+                    print(f"Warning: Frames of {image.nbytes} bytes outgrew the {self.ring.slot_bytes}-byte "
+                          f"shared-memory slots; reallocating.")
+                    self._retired_rings.append(self.ring)
+                self.ring = SharedFrameRing(self.slots, slot_bytes)
+                self.slot_bytes = slot_bytes
+            self.ring.writers += 1
+            return self.ring
+
+    def submit(self, kind, image, **options):
+        """Copies `image` into the ring and queues a "detect" or "encode" task; returns a Future."""
+        image = np.ascontiguousarray(image)
+        ring = self._ring_for(image)
+        try:
+            slot = ring.write(image)
+        finally:
+            with self._lock:
+                ring.writers -= 1
+        future = Future()
+        with self._lock:
+            task_id = next(self._ids)
+            index = min(range(self.processes), key=self._load.__getitem__)
+            self._load[index] += 1
+            tasks = self._task_queues[index]
+            self._pending[task_id] = (future, ring, slot, index, tasks)
+        tasks.put((task_id, kind, ring.name, slot, ring.slot_bytes, image.shape, image.dtype.str, options))
+        return future
+
+    def _finish(self, task_id, result=None, error=None):
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+            if entry is None:
+                return
+            future, ring, slot, index, _ = entry
+            self._load[index] -= 1
+            if error is None:
+                self.tasks_done += 1
+            else:
+                self.tasks_failed += 1
+        ring.release(slot)
+        self._close_retired_rings()
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(RuntimeError(error))
+
+    def _close_retired_rings(self):
+        with self._lock:
+            done = [ring for ring in self._retired_rings if ring.idle and not ring.writers]
+            self._retired_rings = [ring for ring in self._retired_rings if ring not in done]
+        for ring in done:
+            ring.close()
+
+    def _check_workers(self):
+        """Fails the tasks of crashed workers right away and starts replacements."""
+        for index, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            print(f"Warning: {worker.name} exited with code {worker.exitcode}; restarting it.")
+            dead_tasks = self._task_queues[index]
+            with self._lock:
+                # New tasks go to the replacement from here on
+                self._spawn(index)
+                self.workers_restarted += 1
+                lost = [task_id for task_id, entry in self._pending.items() if entry[4] is dead_tasks]
+            for task_id in lost:
+                self._finish(task_id, error=f"{worker.name} died (exit code {worker.exitcode})")
+
+    def _collect(self):
+        next_check = time.monotonic() + HEALTH_CHECK_SECONDS
+        while self._running:
+            try:
+                task_id, result, error = self._results.get(timeout=HEALTH_CHECK_SECONDS)
+                self._finish(task_id, result, error)
+            except queue.Empty:
+                pass
+            if self._running and time.monotonic() >= next_check:
+                next_check = time.monotonic() + HEALTH_CHECK_SECONDS
+                self._check_workers()
+
+    def detector(self, kind="hog"):
+        return RemoteDetector(self, kind)
+
+    def encode_faces(self, bgr_frame, boxes, landmarks=None):
+        """Drop-in for crop_encoding.encode_faces, computed in a worker process."""
+        if not boxes:
+            return []
+        return self.submit("encode", bgr_frame, boxes=[tuple(int(v) for v in box) for box in boxes],
+                           landmarks=landmarks).result(RESULT_TIMEOUT)
+
+    def stats(self):
+        with self._lock:
+            return {"processes": self.processes, "in_flight": len(self._pending), "tasks_done": self.tasks_done,
+                    "tasks_failed": self.tasks_failed, "workers_restarted": self.workers_restarted,
+                    "slot_bytes": self.slot_bytes}
+
+    def close(self):
+        self._running = False
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5.0)
+        if self._collector is not None:
+            self._collector.join(timeout=2.0)
+        for ring in self._retired_rings + [self.ring]:
+            if ring is not None:
+                ring.close()
@@ -0,0 +1,113 @@
+import numpy as np
+
+from gallery import ENCODING_SIZE, squared_distances
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+QUANTIZATION_MODES = ("float16", "int8")
+DEFAULT_RERANK = 8        # Candidates per face re-scored with exact distances
+SCAN_BLOCK_ROWS = 4096    # Codes are widened to float32 one block at a time
+# ===================================================================
+
+
+class QuantizedGallery:
+    """
+    Compact copy of a FaceGallery used for the per-frame scan.
+
+    "float16" halves and "int8" quarters the bytes each scan streams through
+    the cache compared with the float32 gallery (1/4 and 1/8 of the float64
+    lists). int8 codes use a per-dimension scale and offset. The scan ranks
+    the whole gallery on approximate distances, then the best `rerank`
+    candidates per face are re-scored exactly against the gallery's float32
+    rows, so the distance compared with TOLERANCE is always exact.
+
+    The re-rank only reads a few rows per face, so the gallery should be
+    memory-mapped (FaceGallery.memory_map) for the codes to actually save
+    memory: otherwise every process still holds the full float32 matrix.
+    """
+
+    def __init__(self, gallery, mode="int8", rerank=DEFAULT_RERANK):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'. Supported modes are {QUANTIZATION_MODES}.")
+        self.gallery = gallery
+        self.mode = mode
+        self.rerank = rerank
+        self._gallery_version = None
+        self._codes = np.empty((0, ENCODING_SIZE), dtype=np.float16 if mode == "float16" else np.int8)
+        self._scale = np.ones(ENCODING_SIZE, dtype=np.float32)
+        self._offset = np.zeros(ENCODING_SIZE, dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)     # Norms of the *decoded* rows
+
+    @property
+    def nbytes(self):
+        """Bytes held for the scan (codes, norms and int8 scale/offset)."""
+        return self._codes.nbytes + self._sq_norms.nbytes + self._scale.nbytes + self._offset.nbytes
+
+    @property
+    def private_nbytes(self):
+        """Per-process bytes: the scan data plus the float32 rows unless they are memory-mapped."""
+        return self.nbytes + (0 if self.gallery.memory_mapped else self.gallery.encodings.nbytes)
+
+    def build(self):
+        """Quantizes the current gallery contents."""
+        encodings = self.gallery.encodings
+        self._gallery_version = self.gallery.version
+        if self.mode == "float16":
+            self._codes = encodings.astype(np.float16)
+        else:
+            # Asymmetric per-dimension quantization: [min, max] -> [-127, 127]
+            low = encodings.min(axis=0) if len(encodings) else np.zeros(ENCODING_SIZE, np.float32)
+            high = encodings.max(axis=0) if len(encodings) else np.zeros(ENCODING_SIZE, np.float32)
+            self._offset = ((high + low) / 2).astype(np.float32)
+            self._scale = np.maximum((high - low) / 254, 1e-8).astype(np.float32)
+            self._codes = np.clip(np.rint((encodings - self._offset) / self._scale), -127, 127).astype(np.int8)
+        decoded = self._decode(self._codes)
+        self._sq_norms = np.einsum('ij,ij->i', decoded, decoded)
+        return self
+
+    def _decode(self, codes, out=None):
+        if out is None:
+            out = np.empty(codes.shape, dtype=np.float32)
+        out[...] = codes
+        if self.mode == "int8":
+            out *= self._scale
+            out += self._offset
+        return out
+
+    def is_stale(self):
+        return self._gallery_version != self.gallery.version
+
+    def match(self, face_encodings, top_k=1):
+        """
+        Returns (rows, distances), each shaped (faces, k), nearest first.
+        Distances are exact; only the candidate shortlist is approximate.
+        """
+        if self.is_stale():
+            return self.gallery.match(face_encodings, top_k)
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        faces, n = len(queries), len(self._codes)
+        k = min(top_k, n)
+        if faces == 0 or k == 0:
+            return np.empty((faces, k), dtype=np.intp), np.empty((faces, k), dtype=np.float32)
+
+        # --- Approximate scan, widening one bounded block of codes at a time ---
+        approx = np.empty((faces, n), dtype=np.float32)
+        block_buffer = np.empty((min(SCAN_BLOCK_ROWS, n), ENCODING_SIZE), dtype=np.float32)
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, n)
+            block = self._decode(self._codes[start:end], out=block_buffer[:end - start])
+            approx[:, start:end] = squared_distances(queries, block, self._sq_norms[start:end])
+
+        # --- Exact re-rank of the shortlist ---
+        shortlist = min(max(self.rerank, k), n)
+        if shortlist < n:
+            candidates = np.argpartition(approx, shortlist - 1, axis=1)[:, :shortlist]
+        else:
+            candidates = np.broadcast_to(np.arange(n), (faces, n))
+        diff = self.gallery.encodings[candidates] - queries[:, None]     # (faces, shortlist, 128)
+        exact_sq = np.einsum('fsd,fsd->fs', diff, diff)
+        order = np.argsort(exact_sq, axis=1)[:, :k]
+        rows = np.take_along_axis(candidates, order, axis=1)
+        distances = np.sqrt(np.take_along_axis(exact_sq, order, axis=1))
+        return rows, distances
@@ -0,0 +1,494 @@
+import argparse
+import queue
+import threading
+import time
+
+import cv2
+import face_recognition
+
+from ann_index import IVFIndex
+from attendance import AttendanceLog
+from camera_registry import CameraRegistry
+from crop_encoding import encode_faces
+from encoding_cache import load_known_encodings
+from face_quality import FaceQualityGate
+from face_detectors import DETECTORS, make_detector
+from gallery import FaceGallery
+from identity_index import IdentityCentroidIndex
+from motion_gate import MotionGate
+from quantized_gallery import QuantizedGallery, QUANTIZATION_MODES
+from roi_detection import RegionDetector
+from tiled_detection import TiledDetector
+from scale_control import AdaptiveScaleController, scale_box
+from box_tracking import OpticalFlowBoxTracker
+from tracker import IoUTracker, MAX_MISSED_FRAMES, REVERIFY_EVERY_N_FRAMES, appearance_signature
+
+
+def load_gallery(images_path, number_of_cpus=1, gallery=None):
+    """Fills a FaceGallery from the images folder (via the on-disk encoding cache)."""
+    gallery = FaceGallery() if gallery is None else gallery
+    for filename, encoding in load_known_encodings(images_path, number_of_cpus=number_of_cpus):
+        if encoding is None:
+            print(f"Warning: No face found in {filename}. Please replace this image.")
+            continue
+        gallery.add(filename.split('_')[0], encoding)
+    return gallery
+
+
+def make_matcher(gallery, kind="exact", tolerance=0.50, ann_index_path="ann_index.npz", ann_probes=8,
+                 rerank_path="gallery_rerank.npy"):
+    """Returns the matcher for `kind`; all of them expose match(encodings) -> (rows, distances)."""
+    if kind == "ivf":
+        return IVFIndex.load_or_build(gallery, ann_index_path, n_probe=ann_probes)
+    if kind == "centroid":
+        return IdentityCentroidIndex(gallery, max_distance=tolerance).build()
+    if kind in QUANTIZATION_MODES:
+        # The exact re-rank reads the float32 rows from a shared mapping, not a private copy
+        gallery.memory_map(rerank_path)
+        return QuantizedGallery(gallery, kind).build()
+    return gallery
+
+
+class FrameBroadcaster:
+    """
+    Fans encoded frames out to any number of viewers.
+
+    Each subscriber gets its own bounded queue. A slow client never stalls the
+    pipeline: when its queue is full the oldest frame is discarded (and
+    counted) to make room for the newest one.
+    """
+
+    def __init__(self, queue_size=2):
+        self.queue_size = queue_size
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.frames_published = 0
+        self.frames_dropped = 0
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, frame):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.frames_published += 1
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(frame)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                        self.frames_dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def stats(self):
+        return {"subscribers": self.subscriber_count, "frames_published": self.frames_published,
+                "frames_dropped": self.frames_dropped}
+
+
+class RecognitionPipeline:
+    """
+    One always-on background recognition loop per camera.
+
+    Recognition runs at `processing_fps` whether or not anyone is watching, so
+    attendance is marked even with no browser open. Drawing and JPEG encoding
+    only happen while at least one viewer is subscribed; the annotated JPEG is
+    then produced once and broadcast to every /video_feed subscriber.
+
+    _plan() decides per frame whether to detect, follow tracks with optical
+    flow or do nothing, consulting the optional `motion_gate` and
+    `scheduler`; _recognise() detects, encodes and matches. Track boxes are
+    kept in full-frame pixels so they stay valid at any detection scale.
+    """
+
+    def __init__(self, capture, gallery, matcher, attendance, tolerance=0.50,
+                 confirmation_threshold=4, history_length=5, subscriber_queue_size=2,
+                 processing_fps=15, max_missed_frames=MAX_MISSED_FRAMES,
+                 reverify_every=REVERIFY_EVERY_N_FRAMES, detect_every_n=1, motion_gate=None,
+                 region_detector=None, scale_controller=None, full_resolution_encoding=True,
+                 quality_gate=None, encoder=encode_faces, scheduler=None):
+        self.capture = capture
+        self.gallery = gallery
+        self.matcher = matcher
+        self.attendance = attendance
+        self.tolerance = tolerance
+        self.confirmation_threshold = confirmation_threshold
+        self.history_length = history_length
+        self.processing_interval = 1.0 / processing_fps if processing_fps else 0.0
+        self.tracker = IoUTracker(max_missed=max_missed_frames, history_length=history_length)
+        self.reverify_every = reverify_every
+        self.detect_every_n = max(1, detect_every_n)
+        self.flow = OpticalFlowBoxTracker()
+        self.motion_gate = motion_gate
+        if region_detector is None:
+            region_detector = RegionDetector(make_detector("hog"), full_scan_every=1)
+        self.region_detector = region_detector
+        if scale_controller is None:
+            scale_controller = AdaptiveScaleController(levels=((0.25, 1),), start_level=0)
+        self.scale_controller = scale_controller
+        self._flow_scale = scale_controller.scale
+        self.full_resolution_encoding = full_resolution_encoding
+        self.quality_gate = quality_gate
+        self.encoder = encoder
+        self.scheduler = scheduler
+        self.idle = False
+        self._detection_requested = False
+        self._last_detection_time = 0.0
+        self._next_process_time = 0.0
+        self._slots_since_detection = 0
+        self.detections_run = 0
+        self.frames_failed = 0
+        self.flow_steps = 0
+        self.encodings_computed = 0
+        self.encodings_skipped = 0    # Faces on confirmed tracks that reused their cached identity
+        # --- CPU accounting (pipeline thread only) ---
+        self.detections_gated = 0     # Due detections skipped because nothing moved
+        self.detections_deferred = 0  # Due detections postponed by the cross-camera scheduler
+        self.idle_slots_avoided = 0   # Full-rate slots not run while idle
+        self.cpu_seconds_used = 0.0
+        self.cpu_seconds_saved = 0.0  # Estimate: skipped work x its measured average CPU cost
+        self._detection_cpu = 0.0     # Running averages of thread CPU time per slot
+        self._gated_slot_cpu = 0.0
+        self.broadcaster = FrameBroadcaster(subscriber_queue_size)
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=f"recognition-{self.capture.source}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _match_names(self, face_encodings):
+        # One batched GEMM matches every face in the frame against the gallery
+        names = []
+        best_rows, best_distances = self.matcher.match(face_encodings)
+        for best_match_index, best_match_distance in zip(best_rows[:, 0], best_distances[:, 0]):
+            name = "Unknown"
+            if best_match_distance < self.tolerance:
+                name = self.gallery.name_of(best_match_index)
+            names.append(name)
+        return names
+
+    def request_detection(self):
+        """Forces a full detection on the next processing slot."""
+        self._detection_requested = True
+
+    def _detect(self, rgb_small_frame, scale):
+        """
+        HOG detection (full frame or around known faces). Returns the boxes in
+        detection-frame pixels and in full-frame pixels.
+        """
+        visible = [scale_box(track.box, scale) for track in self.tracker.tracks if not track.missed]
+        small_locations, full_scan_seconds = self.region_detector.detect_timed(
+            rgb_small_frame, visible, self.scale_controller.upsample)
+        face_locations = [scale_box(box, 1.0 / scale) for box in small_locations]
+        self.scale_controller.observe(full_scan_seconds, [bottom - top for top, _, bottom, _ in face_locations])
+        return small_locations, face_locations
+
+    def _recognise(self, rgb_small_frame, scale, frame, detections=None):
+        """Detection (unless `detections` are given) plus tracking and (cached) recognition."""
+        small_locations, face_locations = detections or self._detect(rgb_small_frame, scale)
+        tracks = self.tracker.update(face_locations)
+        self.detections_run += 1
+
+        # --- TRACK-LEVEL RESULT CACHE ---
+        # Only new/unconfirmed faces, or confirmed ones due for
+        # re-verification, go through the expensive ResNet encoding.
+        appearances = [appearance_signature(rgb_small_frame, box) for box in small_locations]
+        to_encode = [i for i, track in enumerate(tracks)
+                     if track.needs_encoding(appearances[i], self.reverify_every)]
+        self.encodings_skipped += len(tracks) - len(to_encode)
+        landmarks = None
+        if self.quality_gate is not None:
+            # Hopeless faces would only come back "Unknown": don't spend a ResNet pass on them
+            verdicts = {i: self.quality_gate.assess(frame, face_locations[i]) for i in to_encode}
+            for i in to_encode:
+                if verdicts[i][0] is not None:
+                    tracks[i].quality_rejections += 1
+            to_encode = [i for i in to_encode if verdicts[i][0] is None]
+            landmarks = [verdicts[i][1] for i in to_encode]   # Reused to align the chips
+        if self.full_resolution_encoding:
+            # Detected small, encoded sharp: landmarks + ResNet on full-resolution crops
+            current_face_encodings = self.encoder(frame, [face_locations[i] for i in to_encode], landmarks=landmarks)
+            to_encode = [i for i, encoding in zip(to_encode, current_face_encodings) if encoding is not None]
+            current_face_encodings = [encoding for encoding in current_face_encodings if encoding is not None]
+        else:
+            current_face_encodings = face_recognition.face_encodings(
+                rgb_small_frame, [small_locations[i] for i in to_encode])
+        self.encodings_computed += len(to_encode)
+
+        # --- CONFIDENCE BUFFER LOGIC ---
+        # History is kept per track, so it follows each person even
+        # when faces change order in the frame.
+        for i, name in zip(to_encode, self._match_names(current_face_encodings)):
+            tracks[i].record(name, appearances[i], self.confirmation_threshold)
+        for track in tracks:
+            if track.confirmed_name is not None:
+                self.attendance.mark(track.confirmed_name)
+
+        # Seed optical flow so boxes can follow faces until the next detection
+        if self.detect_every_n > 1:
+            gray = cv2.cvtColor(rgb_small_frame, cv2.COLOR_RGB2GRAY)
+            self.flow.reset(gray, [scale_box(track.box, scale) for track in self.tracker.tracks])
+            self._flow_scale = scale
+
+    def _follow(self, rgb_small_frame):
+        """Moves every track's box into this frame with sparse optical flow."""
+        gray = cv2.cvtColor(rgb_small_frame, cv2.COLOR_RGB2GRAY)
+        self.tracker.move([None if box is None else scale_box(box, 1.0 / self._flow_scale)
+                           for box in self.flow.step(gray)])
+        self.flow_steps += 1
+
+    def _check_motion(self, frame):
+        """Runs the motion gate and switches between the active and idle duty cycle."""
+        if self.motion_gate is None:
+            return True
+        motion = self.motion_gate.update(frame)
+        if motion and self.idle:
+            # Back to full rate on the very first frame that moved
+            self.idle = False
+            self.capture.set_fps(self.motion_gate.active_camera_fps)
+        elif not motion and not self.idle and self.motion_gate.idle:
+            self.idle = True
+            self.capture.set_fps(self.motion_gate.idle_camera_fps)
+        return motion
+
+    def _interval(self):
+        if self.idle and self.motion_gate.idle_processing_fps:
+            return max(self.processing_interval, 1.0 / self.motion_gate.idle_processing_fps)
+        return self.processing_interval
+
+    @staticmethod
+    def _average(average, sample):
+        return sample if average == 0.0 else 0.9 * average + 0.1 * sample
+
+    def _labels(self):
+        """The Kalman-smoothed box and stable name of every visible track."""
+        return [(track.smoother.box, track.confirmed_name or "Processing...")
+                for track in self.tracker.tracks if not track.missed]
+
+    def _draw(self, frame, labels=None):
+        """Draws each (box, name) label, by default those of the current tracks."""
+        for (top, right, bottom, left), name in (self._labels() if labels is None else labels):
+            box_color = (0, 0, 255) if name in ["Unknown", "Processing..."] else (0, 255, 0)
+            cv2.rectangle(frame, (left, top), (right, bottom), box_color, 2)
+            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), box_color, cv2.FILLED)
+            font = cv2.FONT_HERSHEY_DUPLEX
+            cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
+
+    def _plan(self, frame, viewers):
+        """
+        Decides what this frame gets: "detect", "follow" or None.
+
+        Processing runs at a fixed rate. Full detection runs every Nth slot (or
+        on demand / when nothing is tracked); the slots in between, and any
+        extra frames shown to viewers, only move boxes with flow. Slots where
+        the motion gate saw nothing move do neither.
+        """
+        now = time.monotonic()
+        is_slot = now >= self._next_process_time
+        follow_for_viewers = viewers and self.detect_every_n > 1 and self.tracker.tracks
+        if not (is_slot or follow_for_viewers):
+            return None
+        slot_cpu = time.thread_time()
+        motion = True
+        if is_slot:
+            motion = self._check_motion(frame)
+            interval = self._interval()
+            if interval > self.processing_interval > 0:
+                # Idle: count the full-rate slots this longer interval replaces
+                avoided = round(interval / self.processing_interval) - 1
+                self.idle_slots_avoided += avoided
+                self.cpu_seconds_saved += avoided * self._gated_slot_cpu
+            self._next_process_time = now + interval
+            self._slots_since_detection += 1
+        detection_due = is_slot and (self._detection_requested or not self.tracker.tracks
+                                     or self._slots_since_detection >= self.detect_every_n)
+        overdue = (self.motion_gate is not None and
+                   now - self._last_detection_time >= self.motion_gate.max_skip_seconds)
+        if is_slot and not motion and not self._detection_requested and not overdue and not self._unconfirmed():
+            # Nothing moved: faces and boxes are where they were, skip detection and flow.
+            # A face still waiting for a name is never gated: a still student must get identified.
+            # One the quality gate keeps rejecting is not waiting any more (Track.awaiting_name).
+            if detection_due:
+                self.detections_gated += 1
+                self.cpu_seconds_saved += self._detection_cpu
+            if self.scheduler is not None:
+                self.scheduler.withdraw()
+            self._gated_slot_cpu = self._average(self._gated_slot_cpu, time.thread_time() - slot_cpu)
+            return None
+        if detection_due and self.scheduler is not None and not self.scheduler.request(motion, self._unconfirmed()):
+            # Over the shared budget or outranked by a busier camera: ask again next slot
+            self.detections_deferred += 1
+            if self.detect_every_n > 1 and self.tracker.tracks:
+                return "follow"
+            return None
+        if detection_due:
+            self._detection_requested = False
+            self._slots_since_detection = 0
+            self._last_detection_time = now
+            return "detect"
+        if self.tracker.tracks:
+            return "follow"
+        return None
+
+    def _unconfirmed(self):
+        """True while a visible face has not been identified yet and still can be (Track.awaiting_name)."""
+        return any(track.awaiting_name for track in self.tracker.tracks if not track.missed)
+
+    def _process(self, frame, action, viewers):
+        """Runs the planned work on this thread, then draws and broadcasts for viewers."""
+        if action == "detect":
+            slot_cpu, started = time.thread_time(), time.perf_counter()
+            scale = self.scale_controller.scale
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            self._recognise(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB), scale, frame)
+            self._detection_cpu = self._average(self._detection_cpu, time.thread_time() - slot_cpu)
+            if self.scheduler is not None:
+                self.scheduler.charge(time.perf_counter() - started)
+        elif action == "follow":
+            small_frame = cv2.resize(frame, (0, 0), fx=self._flow_scale, fy=self._flow_scale)
+            self._follow(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB))
+
+        if not viewers:
+            return
+
+        # --- Draw results on the frame ---
+        self._draw(frame)
+
+        # Encode once, broadcast to every viewer
+        ret, buffer = cv2.imencode('.jpg', frame)
+        if ret:
+            self.broadcaster.publish(buffer.tobytes())
+
+    def _run(self):
+        # State carried between frames
+        self._next_process_time = 0.0
+        self._slots_since_detection = 0
+        cpu_mark = time.thread_time()
+
+        while self._running:
+            cpu_now = time.thread_time()
+            self.cpu_seconds_used += cpu_now - cpu_mark
+            cpu_mark = cpu_now
+            viewers = self.broadcaster.subscriber_count > 0
+            if not viewers:
+                # Headless: nothing to draw, so sleep until the next processing slot
+                delay = self._next_process_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(min(delay, 0.1))
+                    continue
+
+            success, frame = self.capture.read()
+            if not success:
+                if not self.capture.running:
+                    print("Error: Could not read frame from webcam.")
+                    break
+                continue
+
+            try:
+                self._process(frame, self._plan(frame, viewers), viewers)
+            except Exception as e:  # One bad frame (or a failed worker task) must not end attendance
+                self.frames_failed += 1
+                print(f"Error processing frame from camera {self.capture.source}: {type(e).__name__}: {e}")
+        self._running = False
+
+    def frames(self):
+        """Yields multipart MJPEG chunks for one viewer until it disconnects."""
+        subscriber = self.broadcaster.subscribe()
+        try:
+            while True:
+                try:
+                    frame = subscriber.get(timeout=5.0)
+                except queue.Empty:
+                    if not self._running:
+                        return
+                    continue
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        finally:
+            self.broadcaster.unsubscribe(subscriber)
+
+    @property
+    def running(self):
+        return self._running
+
+    def stats(self):
+        return {"running": self._running, "broadcast": self.broadcaster.stats(),
+                "tracks": len(self.tracker.tracks), "encodings_computed": self.encodings_computed,
+                "encodings_skipped": self.encodings_skipped, "detections_run": self.detections_run,
+                "flow_steps": self.flow_steps, "frames_failed": self.frames_failed,
+                "idle": self.idle, "detections_gated": self.detections_gated,
+                "detections_deferred": self.detections_deferred,
+                "idle_slots_avoided": self.idle_slots_avoided,
+                "cpu_seconds_used": round(self.cpu_seconds_used, 3),
+                "cpu_seconds_saved": round(self.cpu_seconds_saved, 3), "roi": self.region_detector.stats(),
+                "detection_scale": self.scale_controller.stats(),
+                "quality": self.quality_gate.stats() if self.quality_gate is not None else None}
+
+
+# --- HEADLESS MODE: recognition + attendance without Flask ---
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run face recognition attendance headless (no web server).")
+    parser.add_argument("--images", default="images")
+    parser.add_argument("--camera", default="0", help="Camera index, video file or stream URL")
+    parser.add_argument("--fps", type=float, default=15, help="Frames processed per second")
+    parser.add_argument("--tolerance", type=float, default=0.50)
+    parser.add_argument("--matcher", default="exact", help="exact, centroid, ivf, float16 or int8")
+    parser.add_argument("--workers", type=int, default=-1, help="Enrollment worker processes (-1 = all cores)")
+    parser.add_argument("--detector", default="hog", help=", ".join(DETECTORS))
+    parser.add_argument("--crowd", action="store_true", help="Detect on full-resolution tiles (large classes)")
+    parser.add_argument("--idle-after", type=float, default=60.0, help="Seconds without motion before idling")
+    args = parser.parse_args()
+
+    print("Loading known faces...")
+    gallery = load_gallery(args.images, args.workers)
+    if len(gallery) == 0:
+        print("FATAL: No known faces loaded. Check the 'images' folder. Exiting.")
+        exit()
+    print(f"Known faces loaded successfully for {len(gallery.names)} unique people.")
+
+    # Opened like app.py's cameras: an index, a video file played back in real time, or a stream
+    cameras = CameraRegistry()
+    capture = cameras.add("camera", args.camera).capture
+    detector = make_detector(args.detector)
+    scale_controller = None
+    if args.crowd:
+        detector = TiledDetector(detector)
+        scale_controller = AdaptiveScaleController(levels=((1.0, 0),), start_level=0)
+    pipeline = RecognitionPipeline(capture, gallery, make_matcher(gallery, args.matcher, args.tolerance),
+                                   AttendanceLog(), tolerance=args.tolerance, processing_fps=args.fps,
+                                   motion_gate=MotionGate(idle_after_seconds=args.idle_after),
+                                   region_detector=RegionDetector(detector), scale_controller=scale_controller,
+                                   quality_gate=FaceQualityGate())
+    cameras.attach("camera", pipeline)
+    print("Headless recognition running. Press Ctrl+C to stop.")
+    try:
+        while pipeline.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    cameras.stop_all()
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+
+from tracker import iou_matrix
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+ROI_PADDING = 1.0           # Window margin around a track, as a multiple of its box size
+FULL_SCAN_EVERY_N = 10      # Detections between full scans (new faces only appear in full scans)
+MIN_WINDOW_SIZE = 80        # HOG needs some context around a face to find it
+DUPLICATE_IOU = 0.5
+# Static ROI: (top, right, bottom, left) rectangles as fractions of the frame,
+# e.g. [(0.2, 0.7, 1.0, 0.3)] for a doorway band. None scans the whole frame.
+STATIC_ROI = None
+# ===================================================================
+
+
+def _clip(window, height, width):
+    top, right, bottom, left = window
+    return max(top, 0), min(right, width), min(bottom, height), max(left, 0)
+
+
+def _intersect(a, b):
+    top, right, bottom, left = max(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+    if bottom <= top or right <= left:
+        return None
+    return top, right, bottom, left
+
+
+def merge_windows(windows):
+    """Merges overlapping (top, right, bottom, left) windows until none overlap."""
+    windows = list(windows)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(windows)):
+            for j in range(i + 1, len(windows)):
+                if _intersect(windows[i], windows[j]) is not None:
+                    a, b = windows[i], windows.pop(j)
+                    windows[i] = min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3])
+                    merged = True
+                    break
+            if merged:
+                break
+    return windows
+
+
+class RegionDetector:
+    """
+    Runs a face detector only where faces can be.
+
+    Between full scans, detect() searches padded windows around the boxes of
+    existing tracks. A full scan happens every `full_scan_every` detections,
+    when there is nothing to track, or straight away when the windows come back
+    with a different number of faces than there are tracks. Pixels outside the
+    static ROI rectangles are never scanned. `detect_fn(image, upsample)` must
+    return (top, right, bottom, left) boxes, like face_recognition.face_locations.
+    Several threads may call detect() at once; only the bookkeeping is locked.
+    """
+
+    def __init__(self, detect_fn, padding=ROI_PADDING, full_scan_every=FULL_SCAN_EVERY_N,
+                 static_roi=STATIC_ROI, min_window_size=MIN_WINDOW_SIZE):
+        self.detect_fn = detect_fn
+        self.padding = padding
+        self.full_scan_every = max(1, full_scan_every)
+        self.static_roi = static_roi
+        self.min_window_size = min_window_size
+        self._since_full_scan = 0
+        self.full_scans = 0
+        self.window_scans = 0
+        self.pixels_scanned = 0
+        self.pixels_skipped = 0   # Frame pixels a full-frame detector would have scanned on top
+        self._lock = threading.Lock()
+
+    def _static_windows(self, height, width):
+        if not self.static_roi:
+            return [(0, width, height, 0)]
+        return merge_windows(_clip((round(top * height), round(right * width), round(bottom * height),
+                                    round(left * width)), height, width)
+                             for top, right, bottom, left in self.static_roi)
+
+    def _track_windows(self, boxes, height, width):
+        windows = []
+        for top, right, bottom, left in boxes:
+            pad_y = max((bottom - top) * self.padding, (self.min_window_size - (bottom - top)) / 2)
+            pad_x = max((right - left) * self.padding, (self.min_window_size - (right - left)) / 2)
+            window = _clip((int(top - pad_y), int(right + pad_x), int(bottom + pad_y), int(left - pad_x)),
+                           height, width)
+            if window[2] > window[0] and window[1] > window[3]:
+                windows.append(window)
+        return merge_windows(windows)
+
+    def _scan(self, image, windows, upsample):
+        """Returns the de-duplicated boxes found in `windows` and the number of pixels scanned."""
+        boxes = []
+        pixels = 0
+        for top, right, bottom, left in windows:
+            pixels += (bottom - top) * (right - left)
+            crop = np.ascontiguousarray(image[top:bottom, left:right])   # dlib wants contiguous pixels
+            for box_top, box_right, box_bottom, box_left in self.detect_fn(crop, upsample):
+                boxes.append((box_top + top, box_right + left, box_bottom + top, box_left + left))
+        # Merged windows never overlap, but static ROI rectangles may share a face at their border
+        keep = []
+        for box in boxes:
+            if not keep or iou_matrix([box], keep).max() < DUPLICATE_IOU:
+                keep.append(box)
+        return keep, pixels
+
+    def detect(self, image, track_boxes=(), upsample=1):
+        """Returns face boxes in `image` coordinates, scanning as little of it as possible."""
+        return self.detect_timed(image, track_boxes, upsample)[0]
+
+    def detect_timed(self, image, track_boxes=(), upsample=1):
+        """
+        Like detect(), but also returns how long the full-frame scan took, or
+        None when only windows were scanned. Window scans cost a fraction of a
+        frame, so they say nothing about what the next full scan will cost.
+        """
+        height, width = image.shape[:2]
+        static = self._static_windows(height, width)
+        with self._lock:
+            self._since_full_scan += 1
+            windowed = bool(track_boxes) and self._since_full_scan < self.full_scan_every
+        boxes = None
+        scanned = 0
+        if windowed:
+            windows = [window for track_window in self._track_windows(track_boxes, height, width)
+                       for window in (_intersect(track_window, roi) for roi in static) if window is not None]
+            boxes, scanned = self._scan(image, windows, upsample)
+            if len(boxes) != len(track_boxes):
+                boxes = None   # Someone left or two faces merged: confirm with a full scan
+        full_scan = boxes is None
+        full_scan_seconds = None
+        if full_scan:
+            started = time.perf_counter()
+            boxes, pixels = self._scan(image, static, upsample)
+            full_scan_seconds = time.perf_counter() - started
+            scanned += pixels
+        with self._lock:
+            self.window_scans += windowed
+            if full_scan:
+                self._since_full_scan = 0
+                self.full_scans += 1
+            self.pixels_scanned += scanned
+            self.pixels_skipped += max(0, height * width - scanned)
+        return boxes, full_scan_seconds
+
+    def stats(self):
+        total = self.pixels_scanned + self.pixels_skipped
+        stats = {"full_scans": self.full_scans, "window_scans": self.window_scans,
+                 "scanned_fraction": round(self.pixels_scanned / total, 3) if total else 1.0}
+        if hasattr(self.detect_fn, "stats"):
+            stats["detector"] = self.detect_fn.stats()
+        return stats
@@ -0,0 +1,98 @@
+import threading
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+# (resize factor, HOG upsample) pairs from cheapest to most detailed. Shrinking
+# less is preferred to upsampling: same cost for HOG, but sharper faces.
+DETECTION_LEVELS = ((0.25, 0), (0.375, 0), (0.5, 0), (0.75, 0), (1.0, 0), (1.0, 1))
+START_LEVEL = 2
+LATENCY_BUDGET_MS = 60.0   # Target detection latency per processed frame
+MIN_FACE_PIXELS = 70       # Smallest face height HOG finds reliably at detection resolution
+FACE_MARGIN = 1.25         # Keep the smallest face this far above MIN_FACE_PIXELS
+HEADROOM = 0.7             # Only step up if the predicted latency stays under this share of the budget
+SETTLE_DETECTIONS = 5      # Detections between level changes, to avoid oscillating
+# ===================================================================
+
+
+def scale_box(box, factor):
+    """Scales a (top, right, bottom, left) box by `factor`, rounding to whole pixels."""
+    return tuple(int(round(value * factor)) for value in box)
+
+
+class AdaptiveScaleController:
+    """
+    Picks the detection resize factor and HOG upsample count for each frame.
+
+    After every detection, observe() is given the latency of the full-frame
+    scan (None if only windows around tracks were scanned) and the face
+    heights found (in full-frame pixels). The controller steps
+    down a level when it runs over the latency budget or every face would
+    still be comfortably detectable one level down, and steps up when the
+    smallest face is close to HOG's limit (or nothing was found) and the cost
+    of the next level, predicted from its pixel count, still fits the budget.
+    """
+
+    def __init__(self, levels=DETECTION_LEVELS, start_level=START_LEVEL, latency_budget_ms=LATENCY_BUDGET_MS,
+                 min_face_pixels=MIN_FACE_PIXELS):
+        self.levels = tuple(levels)
+        self.level = min(max(start_level, 0), len(self.levels) - 1)
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.min_face_pixels = min_face_pixels
+        self._latency = {}          # Level -> running average detection latency (s)
+        self._since_change = 0
+        self.level_changes = 0
+        self._lock = threading.Lock()   # observe() may be called from several detection threads
+
+    @property
+    def scale(self):
+        return self.levels[self.level][0]
+
+    @property
+    def upsample(self):
+        return self.levels[self.level][1]
+
+    def effective_scale(self, level=None):
+        scale, upsample = self.levels[self.level if level is None else level]
+        return scale * 2 ** upsample
+
+    def _predicted_latency(self, level):
+        if level in self._latency:
+            return self._latency[level]
+        if self.level not in self._latency:
+            return None
+        # HOG cost grows with the number of pixels scanned
+        return self._latency[self.level] * (self.effective_scale(level) / self.effective_scale()) ** 2
+
+    def observe(self, latency, face_heights):
+        """Records one detection and possibly moves to another level for the next."""
+        with self._lock:
+            self._observe(latency, face_heights)
+
+    def _observe(self, latency, face_heights):
+        if latency is not None:
+            previous = self._latency.get(self.level)
+            self._latency[self.level] = latency if previous is None else 0.8 * previous + 0.2 * latency
+        self._since_change += 1
+        if self._since_change < SETTLE_DETECTIONS:
+            return
+        needed = self.min_face_pixels * FACE_MARGIN
+        smallest = min(face_heights) if face_heights else None   # Full-frame pixels
+        if self._latency.get(self.level, 0.0) > self.latency_budget or (
+                smallest is not None and self.level > 0 and smallest * self.effective_scale(self.level - 1) >= needed):
+            self._change(-1)
+        elif (smallest is None or smallest * self.effective_scale() < needed) and self.level + 1 < len(self.levels):
+            predicted = self._predicted_latency(self.level + 1)
+            if predicted is not None and predicted <= self.latency_budget * HEADROOM:
+                self._change(+1)
+
+    def _change(self, step):
+        level = min(max(self.level + step, 0), len(self.levels) - 1)
+        if level != self.level:
+            self.level = level
+            self.level_changes += 1
+            self._since_change = 0
+
+    def stats(self):
+        return {"scale": self.scale, "upsample": self.upsample, "level_changes": self.level_changes,
+                "latency_ms": round(self._latency.get(self.level, 0.0) * 1000, 1)}
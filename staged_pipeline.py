@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from recognition_service import RecognitionPipeline
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+STAGE_QUEUE_SIZE = 2      # Frames waiting in front of each stage; a full queue makes the stage before wait
+DETECT_WORKERS = 2
+RENDER_WORKERS = 2
+# ===================================================================
+
+
+class FrameJob:
+    """One frame travelling through the stages, with what each stage added to it."""
+
+    __slots__ = ("sequence", "frame", "action", "viewers", "scale", "rgb_small_frame", "detections", "labels",
+                 "work_seconds")
+
+    def __init__(self, sequence, frame, action, viewers):
+        self.sequence = sequence
+        self.frame = frame
+        self.action = action
+        self.viewers = viewers
+        self.scale = None
+        self.rgb_small_frame = None
+        self.detections = None
+        self.labels = None
+        self.work_seconds = 0.0   # Detection + recognition time, billed to the scheduler
+
+
+class Stage:
+    """
+    A pool of worker threads fed by one bounded queue.
+
+    Each job goes through `work(job)` and on to the next stage. With
+    `ordered`, jobs that overtook each other in a multi-worker stage before
+    are put back in sequence first; that needs a single worker. Queue depth,
+    jobs done and utilisation (busy time / wall time / workers) are tracked
+    so the bottleneck stage is easy to spot.
+    """
+
+    def __init__(self, name, work, workers=1, queue_size=STAGE_QUEUE_SIZE, ordered=False):
+        if ordered and workers != 1:
+            raise ValueError(f"Ordered stage '{name}' must have exactly one worker")
+        self.name = name
+        self.work = work
+        self.workers = workers
+        self.ordered = ordered
+        self.next_stage = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = False
+        self._started_at = None
+
+    def start(self):
+        self._running = True
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, job):
+        """Blocks while the queue is full; returns False if the stage stopped meanwhile."""
+        while self._running:
+            try:
+                self.queue.put(job, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_job(self, job):
+        started, cpu = time.perf_counter(), time.thread_time()
+        try:
+            self.work(job)
+        except Exception as e:  # One bad frame must not stall the stages behind it
+            print(f"Error in {self.name} stage: {type(e).__name__}: {e}")
+            job.action = None
+        with self._lock:
+            self.processed += 1
+            self.busy_seconds += time.perf_counter() - started
+            self.cpu_seconds += time.thread_time() - cpu
+        if self.next_stage is not None:
+            self.next_stage.put(job)
+
+    def _worker(self):
+        pending = {}          # Ordered stages only: jobs that arrived ahead of their turn
+        next_sequence = 0     # Jobs are numbered from 0 and never dropped once queued
+        while self._running:
+            try:
+                job = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if not self.ordered:
+                self._run_job(job)
+                continue
+            pending[job.sequence] = job
+            while next_sequence in pending:
+                self._run_job(pending.pop(next_sequence))
+                next_sequence += 1
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        with self._lock:
+            utilisation = self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0
+            return {"workers": self.workers, "queue_depth": self.queue.qsize(), "queue_size": self.queue.maxsize,
+                    "processed": self.processed, "utilisation": round(utilisation, 3)}
+
+
+class StagedRecognitionPipeline(RecognitionPipeline):
+    """
+    RecognitionPipeline with its per-frame work split across pipelined stages.
+
+    The capture loop only plans each frame (slot timing, motion gate) and
+    hands it on, so frame N+1 can be detected while frame N is tracked and
+    encoded and frame N-1 is drawn and JPEG encoded:
+
+        detect (pool)  ->  recognise (1 worker, in order)  ->  render (pool)
+
+    Detection only reads the tracks, so it parallelises; tracking, encoding
+    and attendance update shared state and run in frame order on one thread.
+    dlib and OpenCV release the GIL, so the stages really run side by side.
+    """
+
+    def __init__(self, *args, detect_workers=DETECT_WORKERS, render_workers=RENDER_WORKERS,
+                 stage_queue_size=STAGE_QUEUE_SIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stages = [Stage("detect", self._detect_stage, detect_workers, stage_queue_size),
+                       Stage("recognise", self._recognise_stage, 1, stage_queue_size, ordered=True),
+                       Stage("render", self._render_stage, render_workers, stage_queue_size)]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self._sequence = 0
+        self._published_sequence = -1
+        self._publish_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            for stage in self.stages:
+                stage.start()
+        return super().start()
+
+    def stop(self):
+        super().stop()
+        for stage in self.stages:
+            stage.stop()
+
+    def _process(self, frame, action, viewers):
+        """Queues the frame for the stages instead of working on it here."""
+        if action is None and not viewers:
+            return
+        job = FrameJob(self._sequence, frame, action, viewers)
+        if self.stages[0].put(job):
+            self._sequence += 1
+
+    def _detect_stage(self, job):
+        if job.action != "detect":
+            return
+        cpu, started = time.thread_time(), time.perf_counter()
+        job.scale = self.scale_controller.scale
+        small_frame = cv2.resize(job.frame, (0, 0), fx=job.scale, fy=job.scale)
+        job.rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        job.detections = self._detect(job.rgb_small_frame, job.scale)
+        self._detection_cpu = self._average(self._detection_cpu, time.thread_time() - cpu)
+        job.work_seconds += time.perf_counter() - started
+
+    def _recognise_stage(self, job):
+        if job.action == "detect":
+            started = time.perf_counter()
+            self._recognise(job.rgb_small_frame, job.scale, job.frame, job.detections)
+            job.work_seconds += time.perf_counter() - started
+            if self.scheduler is not None:
+                self.scheduler.charge(job.work_seconds)
+        elif job.action == "follow":
+            # Resized here, not in the detect stage: the flow scale is only
+            # known once every earlier detection has reseeded the flow
+            small_frame = cv2.resize(job.frame, (0, 0), fx=self._flow_scale, fy=self._flow_scale)
+            self._follow(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB))
+        if job.viewers:
+            job.labels = self._labels()
+
+    def _render_stage(self, job):
+        if not job.viewers:
+            return
+        self._draw(job.frame, job.labels)
+        ret, buffer = cv2.imencode('.jpg', job.frame)
+        if not ret:
+            return
+        with self._publish_lock:
+            # Render workers can finish out of order; never send a viewer an older frame
+            if job.sequence < self._published_sequence:
+                return
+            self._published_sequence = job.sequence
+            self.broadcaster.publish(buffer.tobytes())
+
+    def stats(self):
+        stats = super().stats()
+        stats["cpu_seconds_used"] = round(self.cpu_seconds_used + sum(stage.cpu_seconds for stage in self.stages), 3)
+        stats["stages"] = {stage.name: stage.stats() for stage in self.stages}
+        return stats
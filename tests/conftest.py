@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery import FaceGallery  # noqa: E402
+
+PEOPLE = 40
+IMAGES_PER_PERSON = 5
+
+
+@pytest.fixture
+def enrolled():
+    """
+    A gallery of clustered random identities, its rows as float64 and noisy
+    queries: 25 enrolled faces and 5 strangers far from everyone.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.normal(0, 0.3, (PEOPLE, 128))
+    encodings = np.repeat(centers, IMAGES_PER_PERSON, axis=0) + rng.normal(0, 0.02, (PEOPLE * IMAGES_PER_PERSON, 128))
+    gallery = FaceGallery(capacity=4)   # Small on purpose: exercises growing
+    for i, encoding in enumerate(encodings):
+        gallery.add(f"person{i // IMAGES_PER_PERSON}", encoding)
+    queries = encodings[rng.integers(0, len(encodings), 25)] + rng.normal(0, 0.02, (25, 128))
+    queries = np.vstack([queries, rng.normal(0, 0.3, (5, 128))])
+    return gallery, encodings.astype(np.float32).astype(np.float64), queries
+
+
+def brute_force(encodings, queries, top_k):
+    """Reference matcher: float64 distances to every row, fully sorted."""
+    distances = np.linalg.norm(encodings[None, :, :] - queries.astype(np.float32)[:, None, :], axis=2)
+    rows = np.argsort(distances, axis=1, kind="stable")[:, :top_k]
+    return rows, np.take_along_axis(distances, rows, axis=1)
+
+
+def assert_same_matches(result, expected):
+    rows, distances = result
+    expected_rows, expected_distances = expected
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(distances, expected_distances, atol=1e-4)
+
+
+@pytest.fixture
+def reference():
+    """(brute_force, assert_same_matches) for comparing a matcher with exact float64 search."""
+    return brute_force, assert_same_matches
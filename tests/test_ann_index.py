@@ -0,0 +1,58 @@
+import numpy as np
+
+from ann_index import IVFIndex
+
+
+def test_searching_every_list_is_exact(enrolled, reference):
+    gallery, encodings, queries = enrolled
+    brute_force, assert_same_matches = reference
+    index = IVFIndex(gallery, n_lists=16, n_probe=16).build()
+    assert_same_matches(index.match(queries, 3), brute_force(encodings, queries, 3))
+
+
+def test_default_probes_recall(enrolled, reference):
+    gallery, encodings, queries = enrolled
+    brute_force, _ = reference
+    rows, _ = IVFIndex(gallery).build().match(queries)
+    expected_rows, _ = brute_force(encodings, queries, 1)
+    # Enrolled faces sit in tight clusters, so the nearest one is nearly always in a probed list
+    assert np.mean(rows[:25, 0] == expected_rows[:25, 0]) >= 0.95
+
+
+def test_load_or_build_reuses_a_matching_index(enrolled, tmp_path, capsys):
+    gallery, _, queries = enrolled
+    path = str(tmp_path / "index.npz")
+    built = IVFIndex.load_or_build(gallery, path)
+    assert "built" in capsys.readouterr().out
+    loaded = IVFIndex.load_or_build(gallery, path)
+    assert "loaded" in capsys.readouterr().out
+    for a, b in zip(built.match(queries, 3), loaded.match(queries, 3)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_load_or_build_rebuilds_after_the_gallery_changed(enrolled, tmp_path, capsys):
+    gallery, _, queries = enrolled
+    path = str(tmp_path / "index.npz")
+    IVFIndex.load_or_build(gallery, path)
+    gallery.add("newcomer", queries[-1])
+    capsys.readouterr()
+    index = IVFIndex.load_or_build(gallery, path)
+    assert "built" in capsys.readouterr().out
+    assert index.match(queries[-1:])[0][0, 0] == len(gallery) - 1
+
+
+def test_load_or_build_survives_a_corrupt_file(enrolled, tmp_path, capsys):
+    gallery, _, _ = enrolled
+    path = tmp_path / "index.npz"
+    path.write_bytes(b"not an index")
+    IVFIndex.load_or_build(gallery, str(path))
+    assert "built" in capsys.readouterr().out
+
+
+def test_stale_index_falls_back_to_exact_search(enrolled, reference):
+    gallery, _, queries = enrolled
+    _, assert_same_matches = reference
+    index = IVFIndex(gallery, n_probe=1).build()
+    gallery.add("newcomer", queries[0])
+    assert index.is_stale()
+    assert_same_matches(index.match(queries, 3), gallery.match(queries, 3))
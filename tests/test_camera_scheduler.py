@@ -0,0 +1,81 @@
+import types
+
+import pytest
+
+import camera_scheduler
+from camera_scheduler import DetectionScheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock for the scheduler: advance it with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(camera_scheduler, "time", fake)
+    return fake
+
+
+def test_grants_while_budget_is_left(clock):
+    scheduler = DetectionScheduler(budget=1.0, burst_seconds=1.0)
+    camera = scheduler.register("a")
+    assert camera.request()
+    camera.charge(0.4)
+    assert camera.request()
+    camera.charge(0.8)
+    assert not camera.request()   # Bucket overdrawn
+    stats = scheduler.stats()["cameras"]["a"]
+    assert stats["granted"] == 2 and stats["deferred"] == 1
+
+
+def test_tokens_refill_at_the_budget_rate(clock):
+    scheduler = DetectionScheduler(budget=0.5, burst_seconds=2.0)
+    camera = scheduler.register("a")
+    camera.charge(2.0)   # Empties the one-second bucket
+    clock.now += 1.9
+    assert not camera.request()
+    clock.now += 0.2
+    assert camera.request()
+    # Idle time never saves up more than the burst
+    clock.now += 100.0
+    assert scheduler.stats()["tokens"] == 1.0
+
+
+def test_higher_priority_camera_goes_first(clock):
+    scheduler = DetectionScheduler(budget=1.0, burst_seconds=1.0)
+    empty_room = scheduler.register("empty")
+    busy_room = scheduler.register("busy")
+    empty_room.charge(1.0)
+    assert not empty_room.request(motion=False)
+    assert not busy_room.request(motion=True, unconfirmed=True)
+    clock.now += 0.5
+    assert not empty_room.request(motion=False)   # Budget is back, but the busy room waits with more priority
+    assert busy_room.request(motion=True, unconfirmed=True)
+    assert empty_room.request(motion=False)       # Nobody else waiting
+
+
+def test_waiting_cameras_age_past_busier_ones(clock):
+    scheduler = DetectionScheduler(budget=1.0, burst_seconds=1.0)
+    empty_room = scheduler.register("empty")
+    busy_room = scheduler.register("busy")
+    empty_room.charge(4.5)
+    for _ in range(8):
+        assert not empty_room.request(motion=False)
+        clock.now += 0.5
+    # The empty room has waited 4 s (priority 0 + 4), the busy one only starts now (1 + 2)
+    assert not busy_room.request(motion=True, unconfirmed=True)
+    assert empty_room.request(motion=False)
+    empty_room.charge(1.0)
+    assert not busy_room.request(motion=True, unconfirmed=True)   # Budget used up again
+
+
+def test_withdrawn_and_silent_cameras_are_not_rivals(clock):
+    scheduler = DetectionScheduler(budget=1.0, burst_seconds=1.0)
+    a = scheduler.register("a")
+    b = scheduler.register("b")
+    c = scheduler.register("c")
+    a.charge(1.0)
+    assert not b.request(motion=True, unconfirmed=True)
+    assert not c.request(motion=True, unconfirmed=True)
+    b.withdraw()
+    clock.now += camera_scheduler.STALE_REQUEST_SECONDS + 0.1   # c stopped asking
+    assert a.request(motion=False)
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("face_recognition")
+cv2 = pytest.importorskip("cv2")
+
+import encoding_cache  # noqa: E402
+from encoding_cache import load_known_encodings  # noqa: E402
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    """An image folder, cache paths inside tmp_path, and the list of images encode_images was asked for."""
+    images = tmp_path / "images"
+    images.mkdir()
+    rng = np.random.default_rng(0)
+    for name in ("alice_1.jpg", "bob_1.jpg"):
+        cv2.imwrite(str(images / name), rng.integers(0, 255, (64, 64, 3), dtype=np.uint8))
+    encoded = []
+    encode_images = encoding_cache.encode_images
+
+    def recording_encode_images(paths, number_of_cpus=1):
+        encoded.extend(os.path.basename(path) for path in paths)
+        return encode_images(paths, number_of_cpus)
+
+    monkeypatch.setattr(encoding_cache, "encode_images", recording_encode_images)
+
+    def load():
+        encoded.clear()
+        return load_known_encodings(str(images), str(tmp_path / "cache.npz"), str(tmp_path / "cache.json"))
+    return images, load, encoded
+
+
+def same_results(a, b):
+    return len(a) == len(b) and all(
+        name_a == name_b and (enc_a is None and enc_b is None or np.array_equal(enc_a, enc_b))
+        for (name_a, enc_a), (name_b, enc_b) in zip(a, b))
+
+
+def test_unchanged_images_come_from_the_cache(folder, capsys):
+    _, load, encoded = folder
+    first = load()
+    assert encoded == ["alice_1.jpg", "bob_1.jpg"]
+    second = load()
+    assert encoded == []
+    assert same_results(first, second)
+    assert "2 cached, 0 (re)encoded, 0 failed" in capsys.readouterr().out
+
+
+def test_touched_but_identical_image_is_still_a_hit(folder):
+    images, load, encoded = folder
+    first = load()
+    stat = os.stat(images / "alice_1.jpg")
+    os.utime(images / "alice_1.jpg", ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert same_results(load(), first)
+    assert encoded == []
+
+
+def test_changed_and_new_images_are_encoded(folder):
+    images, load, encoded = folder
+    load()
+    cv2.imwrite(str(images / "alice_1.jpg"), np.zeros((64, 64, 3), dtype=np.uint8))
+    cv2.imwrite(str(images / "carol_1.jpg"), np.zeros((32, 32, 3), dtype=np.uint8))
+    (images / "notes.txt").write_text("not an image")
+    names = [name for name, _ in load()]
+    assert encoded == ["alice_1.jpg", "carol_1.jpg"]
+    assert names == ["alice_1.jpg", "bob_1.jpg", "carol_1.jpg"]
+
+
+def test_unreadable_images_are_reported_and_retried(folder, capsys):
+    images, load, encoded = folder
+    (images / "broken_1.jpg").write_bytes(b"BAD: not a jpeg")
+    names = [name for name, _ in load()]
+    assert "broken_1.jpg" not in names
+    assert "Could not encode broken_1.jpg" in capsys.readouterr().out
+    load()
+    assert encoded == ["broken_1.jpg"]
+    assert "2 cached, 0 (re)encoded, 1 failed" in capsys.readouterr().out
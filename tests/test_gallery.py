@@ -0,0 +1,55 @@
+import numpy as np
+
+from gallery import FaceGallery
+
+
+def test_add_grows_and_keeps_rows_in_order():
+    gallery = FaceGallery(capacity=1)
+    rows = [gallery.add(name, np.full(128, i, dtype=np.float64)) for i, name in enumerate("abcab")]
+    assert rows == [0, 1, 2, 3, 4]
+    assert len(gallery) == 5
+    assert gallery.names == ["a", "b", "c"]
+    assert [gallery.name_of(row) for row in rows] == list("abcab")
+    np.testing.assert_array_equal(gallery.encodings[:, 0], [0, 1, 2, 3, 4])
+    assert gallery.encodings.dtype == np.float32
+
+
+def test_remove_moves_the_last_row_into_the_gap():
+    gallery = FaceGallery()
+    for i, name in enumerate("abcd"):
+        gallery.add(name, np.full(128, i))
+    version = gallery.version
+    gallery.remove(1)
+    assert [gallery.name_of(row) for row in range(len(gallery))] == ["a", "d", "c"]
+    np.testing.assert_array_equal(gallery.encodings[:, 0], [0, 3, 2])
+    assert gallery.version > version
+
+
+def test_remove_name_drops_every_row_of_that_person():
+    gallery = FaceGallery()
+    for i, name in enumerate("abab"):
+        gallery.add(name, np.full(128, i))
+    assert gallery.remove_name("a") == 2
+    assert gallery.remove_name("nobody") == 0
+    assert [gallery.name_of(row) for row in range(len(gallery))] == ["b", "b"]
+
+
+def test_match_equals_brute_force(enrolled, reference):
+    gallery, encodings, queries = enrolled
+    brute_force, assert_same_matches = reference
+    for top_k in (1, 3):
+        assert_same_matches(gallery.match(queries, top_k), brute_force(encodings, queries, top_k))
+
+
+def test_match_on_an_empty_gallery_finds_nothing():
+    gallery = FaceGallery()
+    rows, distances = gallery.match(np.zeros((2, 128)))
+    assert rows.shape == distances.shape == (2, 0)
+    assert gallery.best_match(np.zeros(128)) == (-1, float("inf"))
+
+
+def test_match_without_faces():
+    gallery = FaceGallery()
+    gallery.add("a", np.zeros(128))
+    rows, distances = gallery.match([])
+    assert rows.shape == distances.shape == (0, 1)
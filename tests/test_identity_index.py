@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from identity_index import IdentityCentroidIndex
+
+
+@pytest.mark.parametrize("top_k", [1, 3])
+def test_matches_brute_force(enrolled, reference, top_k):
+    gallery, encodings, queries = enrolled
+    brute_force, assert_same_matches = reference
+    index = IdentityCentroidIndex(gallery).build()
+    assert_same_matches(index.match(queries, top_k), brute_force(encodings, queries, top_k))
+
+
+def test_max_distance_only_gives_up_on_far_faces(enrolled, reference):
+    gallery, encodings, queries = enrolled
+    brute_force, _ = reference
+    rows, distances = IdentityCentroidIndex(gallery, max_distance=0.5).build().match(queries)
+    expected_rows, expected_distances = brute_force(encodings, queries, 1)
+    near = expected_distances[:, 0] <= 0.5
+    assert near.sum() == 25   # The strangers are the only faces beyond max_distance
+    np.testing.assert_array_equal(rows[near], expected_rows[near])
+    # Far faces may come back as -1 / inf, but never as a wrong row
+    found = rows[:, 0] != -1
+    np.testing.assert_array_equal(rows[found], expected_rows[found])
+    assert np.all(np.isinf(distances[~found]))
+
+
+def test_stale_index_falls_back_to_the_gallery(enrolled, reference):
+    gallery, _, queries = enrolled
+    _, assert_same_matches = reference
+    index = IdentityCentroidIndex(gallery).build()
+    gallery.remove_name("person0")
+    gallery.add("newcomer", queries[0])
+    assert index.is_stale()
+    assert_same_matches(index.match(queries, 3), gallery.match(queries, 3))
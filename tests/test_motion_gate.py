@@ -0,0 +1,54 @@
+import types
+
+import numpy as np
+
+import motion_gate
+from motion_gate import MotionGate
+
+
+def scene(value=40):
+    return np.full((480, 640, 3), value, dtype=np.uint8)
+
+
+def test_static_scene_has_no_motion():
+    gate = MotionGate()
+    assert gate.update(scene())   # Nothing to compare the first frame with
+    assert not any(gate.update(scene()) for _ in range(20))
+
+
+def test_slow_creep_is_caught_by_the_background():
+    gate = MotionGate()
+    gate.update(scene())
+    frame = scene()
+    moved = []
+    for step in range(1, 10):
+        # Each frame differs from the one before by less than pixel_threshold
+        frame[100:300, 200:400] = 40 + 10 * step
+        moved.append(gate.update(frame))
+    assert any(moved)
+
+
+def test_a_change_that_stays_fades_into_the_background():
+    gate = MotionGate()
+    gate.update(scene())
+    frame = scene()
+    frame[100:300, 200:400] = 240
+    assert gate.update(frame)
+    assert not all(gate.update(frame) for _ in range(200))
+    assert not gate.update(frame)
+
+
+def test_idle_after_a_quiet_spell(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(motion_gate, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    gate = MotionGate(idle_after_seconds=60.0)
+    gate.update(scene())
+    now[0] += 59.0
+    gate.update(scene())
+    assert not gate.idle
+    now[0] += 2.0
+    assert gate.idle
+    frame = scene()
+    frame[100:300, 200:400] = 240
+    assert gate.update(frame)
+    assert not gate.idle
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from quantized_gallery import QUANTIZATION_MODES, QuantizedGallery
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_exact_rerank_matches_brute_force(enrolled, reference, mode):
+    gallery, encodings, queries = enrolled
+    brute_force, assert_same_matches = reference
+    # Re-ranking every row leaves nothing to the approximate scan
+    matcher = QuantizedGallery(gallery, mode, rerank=len(gallery)).build()
+    assert_same_matches(matcher.match(queries, 3), brute_force(encodings, queries, 3))
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_default_rerank_finds_the_enrolled_faces(enrolled, reference, mode):
+    gallery, encodings, queries = enrolled
+    brute_force, _ = reference
+    rows, distances = QuantizedGallery(gallery, mode).build().match(queries)
+    expected_rows, expected_distances = brute_force(encodings, queries, 1)
+    np.testing.assert_array_equal(rows[:25], expected_rows[:25])
+    # Distances are always exact, whatever the shortlist
+    np.testing.assert_allclose(distances, np.linalg.norm(encodings[rows[:, 0]] - queries, axis=1)[:, None],
+                               atol=1e-4)
+
+
+def test_codes_are_smaller_than_the_gallery(enrolled):
+    gallery, _, _ = enrolled
+    float16 = QuantizedGallery(gallery, "float16").build()
+    int8 = QuantizedGallery(gallery, "int8").build()
+    assert int8.nbytes < float16.nbytes < gallery.encodings.nbytes
+    # Without a memory-mapped gallery every process still holds the float32 rows
+    assert int8.private_nbytes == int8.nbytes + gallery.encodings.nbytes
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_memory_mapped_gallery(enrolled, reference, tmp_path, mode):
+    gallery, encodings, queries = enrolled
+    brute_force, assert_same_matches = reference
+    gallery.memory_map(str(tmp_path / "rerank.npy"))
+    assert gallery.memory_mapped
+    matcher = QuantizedGallery(gallery, mode, rerank=len(gallery)).build()
+    assert matcher.private_nbytes == matcher.nbytes
+    assert_same_matches(matcher.match(queries, 3), brute_force(encodings, queries, 3))
+
+
+def test_memory_map_reuses_an_identical_file(enrolled, tmp_path):
+    gallery, _, _ = enrolled
+    path = tmp_path / "rerank.npy"
+    gallery.memory_map(str(path))
+    written = path.stat().st_mtime_ns
+    gallery.memory_map(str(path))
+    assert path.stat().st_mtime_ns == written
+
+
+def test_unknown_mode_is_rejected(enrolled):
+    gallery, _, _ = enrolled
+    with pytest.raises(ValueError):
+        QuantizedGallery(gallery, "int4")
+
+
+def test_stale_codes_fall_back_to_the_gallery(enrolled, reference):
+    gallery, _, queries = enrolled
+    _, assert_same_matches = reference
+    matcher = QuantizedGallery(gallery).build()
+    gallery.add("newcomer", queries[0])
+    assert matcher.is_stale()
+    assert_same_matches(matcher.match(queries, 3), gallery.match(queries, 3))
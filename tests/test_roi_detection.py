@@ -0,0 +1,79 @@
+import numpy as np
+
+from roi_detection import RegionDetector, merge_windows
+
+
+def test_merge_windows_joins_overlaps_transitively():
+    # a overlaps b, and only their union overlaps c
+    a, b, c = (0, 100, 100, 0), (50, 180, 150, 90), (140, 260, 200, 170)
+    assert merge_windows([a, b, c]) == [(0, 260, 200, 0)]
+
+
+def test_merge_windows_leaves_disjoint_and_touching_windows_alone():
+    windows = [(0, 100, 100, 0), (0, 200, 100, 100), (300, 400, 400, 300)]
+    assert merge_windows(windows) == windows
+
+
+def test_merged_windows_never_overlap():
+    windows = [(y, x + 60, y + 60, x) for y in range(0, 400, 45) for x in range(0, 400, 130)]
+    merged = merge_windows(windows)
+    for i, (top, right, bottom, left) in enumerate(merged):
+        for other_top, other_right, other_bottom, other_left in merged[i + 1:]:
+            assert min(bottom, other_bottom) <= max(top, other_top) or min(right, other_right) <= max(left, other_left)
+    # Every input window is inside some merged window
+    for top, right, bottom, left in windows:
+        assert any(t <= top and r >= right and b >= bottom and l <= left for t, r, b, l in merged)
+
+
+def offset_detector(faces):
+    """An image whose pixels encode their own position, and a fake detect_fn that uses it to find `faces`."""
+    image = np.zeros((480, 640), dtype=np.int32)
+    image[...] = np.arange(640)[None, :] + 1000 * np.arange(480)[:, None]
+    found = []
+
+    def detect(crop, upsample):
+        top, left = divmod(int(crop[0, 0]), 1000)
+        found.append(crop.shape)
+        bottom, right = top + crop.shape[0], left + crop.shape[1]
+        return [(t - top, r - left, b - top, l - left) for t, r, b, l in faces
+                if t >= top and l >= left and b <= bottom and r <= right]
+    return image, detect, found
+
+
+def test_tracked_faces_are_found_by_scanning_windows_only():
+    faces = [(100, 200, 180, 120), (300, 520, 380, 440)]
+    image, detect, scans = offset_detector(faces)
+    detector = RegionDetector(detect, full_scan_every=10)
+    assert sorted(detector.detect(image)) == sorted(faces)   # No tracks yet: full scan
+    assert sorted(detector.detect(image, faces)) == sorted(faces)
+    assert detector.full_scans == 1 and detector.window_scans == 1
+    assert all(shape[0] * shape[1] < 480 * 640 for shape in scans[1:])
+
+
+def test_a_face_missing_from_the_windows_forces_a_full_scan():
+    faces = [(100, 200, 180, 120), (300, 520, 380, 440)]
+    image, detect, _ = offset_detector(faces)
+    detector = RegionDetector(detect, full_scan_every=10)
+    # Only one of the two tracked faces is still there: confirm with a full scan
+    tracked = faces + [(20, 620, 100, 540)]
+    assert sorted(detector.detect(image, tracked)) == sorted(faces)
+    assert detector.full_scans == 1
+
+
+def test_full_scan_every_n_detections():
+    faces = [(100, 200, 180, 120)]
+    image, detect, _ = offset_detector(faces)
+    detector = RegionDetector(detect, full_scan_every=3)
+    for _ in range(6):
+        detector.detect(image, faces)
+    assert detector.full_scans == 2 and detector.window_scans == 4
+
+
+def test_detect_timed_only_times_full_scans():
+    faces = [(100, 200, 180, 120)]
+    image, detect, _ = offset_detector(faces)
+    detector = RegionDetector(detect, full_scan_every=10)
+    boxes, full_scan_seconds = detector.detect_timed(image)
+    assert boxes == faces and full_scan_seconds is not None and full_scan_seconds >= 0
+    boxes, full_scan_seconds = detector.detect_timed(image, faces)
+    assert boxes == faces and full_scan_seconds is None
@@ -0,0 +1,59 @@
+from scale_control import SETTLE_DETECTIONS, AdaptiveScaleController
+
+# Default levels: start at (0.5, 0); below is (0.375, 0), above is (0.75, 0)
+
+
+def observe(controller, latency, face_heights, times=SETTLE_DETECTIONS):
+    for _ in range(times):
+        controller.observe(latency, face_heights)
+
+
+def test_small_faces_step_up_when_the_budget_allows():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, 0.010, [100])   # 50 px at detection scale: too close to HOG's limit
+    assert controller.scale == 0.75 and controller.level_changes == 1
+
+
+def test_small_faces_stay_put_when_the_next_level_would_blow_the_budget():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, 0.030, [100])   # Predicted 0.030 * 1.5 ** 2 = 68 ms
+    assert controller.scale == 0.5 and controller.level_changes == 0
+
+
+def test_over_budget_latency_steps_down():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, 0.100, [100])
+    assert controller.scale == 0.375
+
+
+def test_big_faces_step_down():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, 0.010, [400])   # Still 150 px one level down
+    assert controller.scale == 0.375
+
+
+def test_levels_only_change_after_settling():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, 0.100, [100], times=SETTLE_DETECTIONS - 1)
+    assert controller.scale == 0.5
+    observe(controller, 0.100, [100], times=1)
+    assert controller.scale == 0.375
+    # The count starts again at the new level
+    observe(controller, 0.100, [100], times=SETTLE_DETECTIONS - 1)
+    assert controller.scale == 0.375
+
+
+def test_window_only_detections_leave_the_latency_alone():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, 0.010, [200])
+    observe(controller, None, [200], times=3 * SETTLE_DETECTIONS)
+    assert controller.stats()["latency_ms"] == 10.0
+
+
+def test_no_step_up_before_a_full_scan_was_timed():
+    controller = AdaptiveScaleController(latency_budget_ms=60.0)
+    observe(controller, None, [], times=3 * SETTLE_DETECTIONS)
+    assert controller.scale == 0.5 and controller.level_changes == 0
+    # Shrinking never needs a prediction
+    observe(controller, None, [400])
+    assert controller.scale == 0.375
@@ -0,0 +1,77 @@
+import random
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("face_recognition")
+
+from staged_pipeline import FrameJob, Stage  # noqa: E402
+
+
+class Collector:
+    """Last stage of a test chain: records the jobs that reach it."""
+
+    def __init__(self, count):
+        self.sequences = []
+        self.actions = []
+        self._count = count
+        self.done = threading.Event()
+
+    def put(self, job):
+        self.sequences.append(job.sequence)
+        self.actions.append(job.action)
+        if len(self.sequences) == self._count:
+            self.done.set()
+        return True
+
+
+def jobs(count):
+    return [FrameJob(sequence, None, "detect", []) for sequence in range(count)]
+
+
+def run_chain(stages, collector, to_send):
+    for stage, next_stage in zip(stages, stages[1:] + [collector]):
+        stage.next_stage = next_stage
+        stage.start()
+    try:
+        for job in to_send:
+            assert stages[0].put(job)
+        assert collector.done.wait(timeout=10)
+    finally:
+        for stage in stages:
+            stage.stop()
+
+
+def test_ordered_stage_restores_the_sequence_after_a_pool():
+    rng = random.Random(0)
+    pool = Stage("pool", lambda job: time.sleep(rng.random() * 0.01), workers=4, queue_size=4)
+    ordered = Stage("ordered", lambda job: None, ordered=True)
+    collector = Collector(40)
+    run_chain([pool, ordered], collector, jobs(40))
+    assert collector.sequences == list(range(40))
+
+
+def test_ordered_stage_holds_jobs_that_arrive_early():
+    ordered = Stage("ordered", lambda job: None, queue_size=10, ordered=True)
+    collector = Collector(5)
+    run_chain([ordered], collector, [jobs(5)[i] for i in (3, 1, 4, 0, 2)])
+    assert collector.sequences == [0, 1, 2, 3, 4]
+
+
+def test_a_failing_job_does_not_stall_the_stages_behind(capsys):
+    def work(job):
+        if job.sequence == 2:
+            raise RuntimeError("bad frame")
+
+    stage = Stage("flaky", work)
+    collector = Collector(5)
+    run_chain([stage], collector, jobs(5))
+    assert collector.actions == ["detect", "detect", None, "detect", "detect"]
+    assert "Error in flaky stage: RuntimeError: bad frame" in capsys.readouterr().out
+    assert stage.stats()["processed"] == 5
+
+
+def test_ordered_stage_needs_a_single_worker():
+    with pytest.raises(ValueError):
+        Stage("ordered", lambda job: None, workers=2, ordered=True)
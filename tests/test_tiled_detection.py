@@ -0,0 +1,40 @@
+import numpy as np
+
+from tiled_detection import non_max_suppression, tile_windows
+
+
+def test_nms_keeps_the_biggest_of_overlapping_boxes():
+    whole = (100, 220, 220, 100)
+    shifted = (105, 225, 225, 105)
+    assert non_max_suppression([shifted, whole, (100, 223, 223, 100)]) == [(100, 223, 223, 100)]
+
+
+def test_nms_drops_a_box_cut_by_a_tile_seam():
+    whole = (100, 220, 220, 100)
+    cut = (100, 160, 220, 100)   # Left half of the same face: low IoU, but contained
+    assert non_max_suppression([cut, whole]) == [whole]
+
+
+def test_nms_keeps_separate_faces_in_input_order():
+    boxes = [(0, 50, 50, 0), (0, 300, 60, 240), (200, 120, 260, 60)]
+    assert non_max_suppression(boxes) == boxes
+    assert non_max_suppression([]) == []
+
+
+def test_tiles_cover_the_image_with_overlap():
+    height, width, overlap = 1080, 1920, 160
+    tiles = tile_windows(height, width, tile_size=640, overlap=overlap)
+    covered = np.zeros((height, width), dtype=np.int32)
+    for top, right, bottom, left in tiles:
+        assert 0 <= top < bottom <= height and 0 <= left < right <= width
+        covered[top:bottom, left:right] += 1
+    assert covered.min() >= 1
+    # Any face no bigger than the overlap lies whole inside some tile
+    for top in range(0, height - overlap, 37):
+        for left in range(0, width - overlap, 53):
+            assert any(t <= top and l <= left and b >= top + overlap and r >= left + overlap
+                       for t, r, b, l in tiles)
+
+
+def test_small_image_is_one_tile():
+    assert tile_windows(300, 400, tile_size=640) == [(0, 400, 300, 0)]
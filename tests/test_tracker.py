@@ -0,0 +1,37 @@
+from tracker import IoUTracker
+
+FACES = [(100, 200, 200, 100), (100, 400, 200, 300), (300, 260, 420, 140)]
+
+
+def ids(tracks):
+    return [track.track_id for track in tracks]
+
+
+def test_track_ids_follow_faces_when_detections_are_reordered():
+    tracker = IoUTracker()
+    first = ids(tracker.update(FACES))
+    # Same faces, moved a little and reported in a different order
+    moved = [(top + 5, right + 8, bottom + 5, left + 8) for top, right, bottom, left in FACES]
+    order = [2, 0, 1]
+    second = ids(tracker.update([moved[i] for i in order]))
+    assert second == [first[i] for i in order]
+
+
+def test_new_face_gets_a_new_id_and_others_keep_theirs():
+    tracker = IoUTracker()
+    first = ids(tracker.update(FACES[:2]))
+    second = ids(tracker.update([FACES[2], FACES[1], FACES[0]]))
+    assert second[1:] == [first[1], first[0]]
+    assert second[0] not in first
+
+
+def test_track_survives_missed_detections_then_expires():
+    tracker = IoUTracker(max_missed=2)
+    face_id = ids(tracker.update(FACES[:1]))[0]
+    tracker.update([])
+    tracker.update([])
+    assert ids(tracker.update(FACES[:1])) == [face_id]
+    for _ in range(3):
+        tracker.update([])
+    assert tracker.tracks == []
+    assert ids(tracker.update(FACES[:1])) != [face_id]
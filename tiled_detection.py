@@ -0,0 +1,102 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+TILE_SIZE = 640           # Tile side in pixels at detection resolution
+TILE_OVERLAP = 160        # Must exceed the largest expected face, so every face is whole in some tile
+NMS_IOU = 0.3             # Boxes overlapping more than this are the same face
+NMS_CONTAINMENT = 0.6     # ...as is a box mostly inside a bigger one (a face cut by a tile seam)
+TILE_WORKERS = None       # Threads detecting tiles in parallel (None = one per core)
+# ===================================================================
+
+
+def tile_windows(height, width, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Overlapping (top, right, bottom, left) tiles covering a height x width image."""
+    step = max(tile_size - overlap, 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]   # Last tile flush with the edge
+
+    return [(top, min(left + tile_size, width), min(top + tile_size, height), left)
+            for top in starts(height) for left in starts(width)]
+
+
+def non_max_suppression(boxes, iou_threshold=NMS_IOU, containment_threshold=NMS_CONTAINMENT):
+    """
+    Merges duplicate (top, right, bottom, left) boxes, keeping the biggest of
+    each group: a face cut by a tile seam is only partly inside its tile, so
+    the largest box is the one that saw the whole face.
+    """
+    if not boxes:
+        return []
+    b = np.asarray(boxes, dtype=np.float32)
+    areas = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    keep = []
+    for i in np.argsort(areas)[::-1]:
+        duplicate = False
+        for k in keep:
+            height = min(b[i, 2], b[k, 2]) - max(b[i, 0], b[k, 0])
+            width = min(b[i, 1], b[k, 1]) - max(b[i, 3], b[k, 3])
+            intersection = max(height, 0) * max(width, 0)
+            union = areas[i] + areas[k] - intersection
+            if intersection / max(union, 1e-9) > iou_threshold or \
+                    intersection / max(areas[i], 1e-9) > containment_threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            keep.append(i)
+    return [boxes[i] for i in sorted(keep)]
+
+
+class TiledDetector:
+    """
+    Crowd mode: detects faces in overlapping tiles of a large frame.
+
+    Back-row faces in a wide classroom shot are too small for HOG once the
+    whole frame is shrunk, and upsampling the whole frame is too slow. Tiles
+    of the full-resolution frame are instead detected in parallel on a thread
+    pool (dlib and OpenCV release the GIL while they work), and duplicates
+    along the seams are merged with NMS. It is a drop-in detector: any backend
+    from face_detectors goes in, and it is called the same way.
+    """
+
+    def __init__(self, detector, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, workers=TILE_WORKERS):
+        self.detector = detector
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix="tile")
+        self.tiles_scanned = 0
+        self.duplicates_merged = 0
+
+    def _detect_tile(self, image, window, upsample):
+        top, right, bottom, left = window
+        crop = np.ascontiguousarray(image[top:bottom, left:right])
+        return [(box_top + top, box_right + left, box_bottom + top, box_left + left)
+                for box_top, box_right, box_bottom, box_left in self.detector(crop, upsample)]
+
+    def __call__(self, rgb_image, upsample=1):
+        windows = tile_windows(rgb_image.shape[0], rgb_image.shape[1], self.tile_size, self.overlap)
+        if len(windows) == 1:
+            return self.detector(rgb_image, upsample)
+        found = self._pool.map(lambda window: self._detect_tile(rgb_image, window, upsample), windows)
+        boxes = [box for tile_boxes in found for box in tile_boxes]
+        merged = non_max_suppression(boxes)
+        self.tiles_scanned += len(windows)
+        self.duplicates_merged += len(boxes) - len(merged)
+        return merged
+
+    def batch(self, rgb_images, upsample=1):
+        return [self(image, upsample) for image in rgb_images]
+
+    def stats(self):
+        return {"tiles_scanned": self.tiles_scanned, "duplicates_merged": self.duplicates_merged}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,173 @@
+from collections import deque
+
+import numpy as np
+
+from box_tracking import FLOW_NOISE, KalmanBoxFilter
+
+# ===================================================================
+#                          CONFIGURATION
+# ===================================================================
+IOU_THRESHOLD = 0.3       # Minimum overlap for a detection to continue a track
+MAX_MISSED_FRAMES = 5     # Processed frames a track may go undetected before it expires
+# --- Confirmed tracks skip encoding until one of these triggers re-verification ---
+REVERIFY_EVERY_N_FRAMES = 10
+MIN_BOX_IOU = 0.5         # Box moved so far from where it was last verified that it may be someone else
+MAX_APPEARANCE_CHANGE = 0.6   # Mean abs difference of normalised face thumbnails
+APPEARANCE_SIZE = 16
+MAX_QUALITY_REJECTIONS = 5    # Quality-gate rejections in a row before an unnamed face stops waiting for a name
+# ===================================================================
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of (top, right, bottom, left) boxes, shaped (len(a), len(b))."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def appearance_signature(image, box, size=APPEARANCE_SIZE):
+    """Tiny zero-mean, unit-variance grayscale thumbnail of a face, for change detection."""
+    top, right, bottom, left = box
+    crop = image[max(top, 0):max(bottom, top + 1), max(left, 0):max(right, left + 1)]
+    if crop.size == 0:
+        return None
+    ys = np.linspace(0, crop.shape[0] - 1, size).astype(np.intp)
+    xs = np.linspace(0, crop.shape[1] - 1, size).astype(np.intp)
+    thumb = crop[ys][:, xs].astype(np.float32)
+    if thumb.ndim == 3:
+        thumb = thumb.mean(axis=2)
+    thumb -= thumb.mean()
+    return thumb / (thumb.std() + 1e-6)
+
+
+class Track:
+    """One face followed across frames, with its own recognition history."""
+
+    def __init__(self, track_id, box, history_length):
+        self.track_id = track_id
+        self.box = box
+        self.history = deque(maxlen=history_length)
+        self.missed = 0       # Consecutive updates without a matching detection
+        self.hits = 1         # Detections associated with this track so far
+        self.smoother = KalmanBoxFilter(box)   # Smoothed box for display between detections
+        # --- Result cache: a confirmed identity is reused instead of re-encoding ---
+        self.confirmed_name = None
+        self.frames_since_verified = 0
+        self._verified_box = None
+        self._verified_appearance = None
+        self.quality_rejections = 0   # Encode attempts in a row turned down by the quality gate
+
+    def needs_encoding(self, appearance, reverify_every=REVERIFY_EVERY_N_FRAMES,
+                       min_box_iou=MIN_BOX_IOU, max_appearance_change=MAX_APPEARANCE_CHANGE):
+        """
+        True unless the track is confirmed and nothing suggests its identity
+        could have changed since it was last verified.
+        """
+        if self.confirmed_name is None:
+            return True
+        self.frames_since_verified += 1
+        if self.frames_since_verified >= reverify_every:
+            return True
+        if iou_matrix([self.box], [self._verified_box])[0, 0] < min_box_iou:
+            return True
+        if appearance is None or self._verified_appearance is None:
+            return True
+        return float(np.abs(appearance - self._verified_appearance).mean()) > max_appearance_change
+
+    def record(self, name, appearance, confirmation_threshold):
+        """Adds a freshly matched name and updates the cached confirmed identity."""
+        self.history.append(name)
+        self.quality_rejections = 0
+        self.confirmed_name = self.stable_name(confirmation_threshold)
+        self.frames_since_verified = 0
+        self._verified_box = self.box
+        self._verified_appearance = appearance
+
+    @property
+    def awaiting_name(self):
+        """
+        True while the track is unnamed and can still get a name. A face the
+        quality gate keeps rejecting (too small, blurry, in profile) will not
+        get one until it changes, which the motion gate notices.
+        """
+        return self.confirmed_name is None and self.quality_rejections < MAX_QUALITY_REJECTIONS
+
+    def stable_name(self, confirmation_threshold):
+        """The confirmed name once the history agrees often enough, else None."""
+        if len(self.history) < self.history.maxlen:
+            return None
+        most_common_name = max(set(self.history), key=list(self.history).count)
+        if list(self.history).count(most_common_name) >= confirmation_threshold:
+            return most_common_name
+        return None
+
+
+class IoUTracker:
+    """
+    Associates face boxes across frames so each face keeps a stable track ID.
+
+    Detections are matched to existing tracks greedily by highest IoU (above
+    `iou_threshold`); unmatched detections start new tracks and tracks that
+    go `max_missed` updates without a detection are dropped.
+    """
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_missed=MAX_MISSED_FRAMES, history_length=5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.history_length = history_length
+        self.tracks = []
+        self._next_id = 0
+
+    def update(self, boxes):
+        """Returns the Track for each box, in the same order as `boxes`."""
+        assigned = [None] * len(boxes)
+        unmatched_tracks = set(range(len(self.tracks)))
+        if self.tracks and boxes:
+            overlaps = iou_matrix([track.box for track in self.tracks], boxes)
+            # Greedy assignment: repeatedly take the best remaining (track, box) pair
+            for flat in np.argsort(overlaps, axis=None)[::-1]:
+                t, b = np.unravel_index(flat, overlaps.shape)
+                if overlaps[t, b] < self.iou_threshold:
+                    break
+                if t not in unmatched_tracks or assigned[b] is not None:
+                    continue
+                track = self.tracks[t]
+                track.box = boxes[b]
+                track.smoother.predict()
+                track.smoother.update(boxes[b])
+                track.missed = 0
+                track.hits += 1
+                assigned[b] = track
+                unmatched_tracks.discard(t)
+
+        for t in unmatched_tracks:
+            self.tracks[t].missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        for b, box in enumerate(boxes):
+            if assigned[b] is None:
+                track = Track(self._next_id, box, self.history_length)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[b] = track
+        return assigned
+
+    def move(self, moved_boxes):
+        """
+        Applies between-detection box motion (e.g. optical flow), aligned with
+        self.tracks. None means the motion was lost; the track then coasts on
+        its Kalman prediction.
+        """
+        for track, box in zip(self.tracks, moved_boxes):
+            track.smoother.predict()
+            if box is not None:
+                track.box = box
+                track.smoother.update(box, FLOW_NOISE)